@@ -1,58 +1,242 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
 import os
-from datetime import datetime
+
+# Las operaciones de numpy son matriz-vector chicas y el paralelismo ya lo dan
+# los hilos de gunicorn: un pool de BLAS/OpenMP por hilo solo sobresuscribe
+# los núcleos. Tiene que definirse antes de importar numpy
+for _variable in ('OPENBLAS_NUM_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(_variable, '1')
+
+from flask import Flask, Request, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from flask_cors import CORS
+try:
+    from flask_compress import Compress
+    COMPRESION_DISPONIBLE = True
+except ImportError:
+    COMPRESION_DISPONIBLE = False
+import orjson
+import base64
+import hashlib
+import binascii
+import io
+import numpy as np
+import logging
+import logging.handlers
+import queue
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
 
 # Imports de los módulos locales
 from persistencia.databaseManager import DatabaseManager
 from validarEmpleado.validarLegajo import ValidadorLegajo
 from validarEmpleado.validarTurno import ValidadorTurno
 from persistencia.registrarAsistencia import RegistrarAsistencias
+from reconocimiento.indiceEmbeddings import IndiceEmbeddings
+
+# En producción solo WARNING o superior; LOG_LEVEL=INFO para ver el detalle.
+# Los hilos de los requests solo encolan el registro: la escritura a stderr
+# (que en Docker es un pipe y puede bloquear) la hace un hilo aparte
+_cola_logs = queue.SimpleQueue()
+_salida_logs = logging.StreamHandler()
+_salida_logs.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+_listener_logs = logging.handlers.QueueListener(_cola_logs, _salida_logs)
+
+# El QueueHandler solo arma el mensaje (con traceback); el formato final lo da _salida_logs
+_encolar_logs = logging.handlers.QueueHandler(_cola_logs)
+_encolar_logs.setFormatter(logging.Formatter('%(message)s'))
+
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'WARNING').upper(),
+    handlers=[_encolar_logs]
+)
+_listener_logs.start()
+atexit.register(_listener_logs.stop)
+
+logger = logging.getLogger(__name__)
 
 # Intentar cargar módulos de reconocimiento facial
 try:
-    from generarEmbedding import generarEmbedding, reconocer_empleado
+    from generarEmbedinng import generar_embedding_promedio, validar_embedding, reconocer_empleado, precalentar, leer_bytes_imagen
     RECONOCIMIENTO_DISPONIBLE = True
     EMBEDDING_DISPONIBLE = True
-    print("INFO: Reconocimiento facial con OpenCV cargado correctamente")
+    logger.info("Reconocimiento facial con OpenCV cargado correctamente")
 except Exception as e:
     RECONOCIMIENTO_DISPONIBLE = False
     EMBEDDING_DISPONIBLE = False
-    print(f"WARNING: Error cargando reconocimiento: {e}")
+    logger.warning("Error cargando reconocimiento: %s", e)
+
+# Pagar la inicialización de OpenCV al arrancar el worker, no en el primer request
+if EMBEDDING_DISPONIBLE:
+    try:
+        precalentar()
+    except Exception as e:
+        logger.warning("No se pudo precalentar el reconocimiento: %s", e)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Serializa las respuestas con orjson en lugar del json de la biblioteca estándar"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+class RequestEnMemoria(Request):
+    """
+    Guarda los archivos subidos en memoria en lugar de un archivo temporal
+
+    Werkzeug vuelca a disco todo upload de más de 500KB; con MAX_CONTENT_LENGTH
+    acotado conviene un BytesIO, cuyo buffer leer_bytes_imagen pasa a OpenCV
+    sin copiarlo.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = RequestEnMemoria
+app.json = ORJSONProvider(app)
 CORS(app)
 
+# Comprimir las respuestas JSON grandes (/empleados, /asistencias) con brotli o gzip
+if COMPRESION_DISPONIBLE:
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(app)
+
+# Tope del cuerpo de los requests: una foto de celular entra holgada y
+# un upload gigante se rechaza antes de leerlo
+app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
+
 # Inicializar managers
 database_manager = DatabaseManager()
-print("INFO: DatabaseManager cargado correctamente")
+logger.info("DatabaseManager cargado correctamente")
 
-# Cargar empleados desde la base de datos con manejo de errores
-try:
-    empleados = database_manager.obtener_todos_empleados()
-    print(f"INFO: Cargados {len(empleados)} empleados desde la base de datos")
-except Exception as e:
-    print(f"ERROR cargando empleados: {e}")
-    empleados = []
+# Validadores e índice de embeddings: se cargan desde la base en el primer
+# request que los necesita (ver obtener_validadores), no al importar el módulo
+validador_legajo = None
+validador_turno = None
+indice_embeddings = IndiceEmbeddings()
 
-# Inicializar validadores
-validador_legajo = ValidadorLegajo(empleados)
-validador_turno = ValidadorTurno(empleados)
+# Inicializar registro de asistencias sobre el mismo pool de conexiones
+registrar_asistencias = RegistrarAsistencias(pool=database_manager.pool)
 
-# Inicializar registro de asistencias
-registrar_asistencias = RegistrarAsistencias()
+# Pool acotado para decodificación y embedding: OpenCV y numpy liberan el GIL,
+# así varias imágenes se procesan en paralelo sin bloquear el hilo del request
+MAX_TRABAJOS_EMBEDDING = os.cpu_count() or 1
+TIMEOUT_EMBEDDING = 30
+executor_embedding = ThreadPoolExecutor(max_workers=MAX_TRABAJOS_EMBEDDING)
+_cupos_embedding = threading.BoundedSemaphore(MAX_TRABAJOS_EMBEDDING * 2)
 
-def actualizar_validadores():
-    """Función auxiliar para actualizar los validadores con empleados frescos"""
+class ServidorOcupado(Exception):
+    """Se alcanzó el máximo de trabajos de imagen en curso"""
+    pass
+
+def ejecutar_en_pool(funcion, *args):
+    """Ejecuta funcion en el pool de embedding y espera su resultado; falla rápido si está lleno"""
+    if not _cupos_embedding.acquire(blocking=False):
+        raise ServidorOcupado()
+    
     try:
-        empleados_actualizados = database_manager.obtener_todos_empleados()
-        global validador_legajo, validador_turno
-        validador_legajo = ValidadorLegajo(empleados_actualizados)
-        validador_turno = ValidadorTurno(empleados_actualizados)
-        return True
-    except Exception as e:
-        print(f"ERROR actualizando validadores: {e}")
-        return False
+        futuro = executor_embedding.submit(funcion, *args)
+    except Exception:
+        _cupos_embedding.release()
+        raise
+    
+    futuro.add_done_callback(lambda _: _cupos_embedding.release())
+    return futuro.result(timeout=TIMEOUT_EMBEDDING)
+
+# Cuerpos JSON de los rechazos frecuentes, serializados una sola vez al cargar el módulo
+CUERPO_OCUPADO = orjson.dumps({"exito": False, "mensaje": "Servidor ocupado, reintente en unos segundos"})
+CUERPO_VALIDAR_SIN_DATOS = orjson.dumps({"valido": False, "mensaje": "No se recibieron datos"})
+CUERPO_VALIDAR_FALTAN_CAMPOS = orjson.dumps({"valido": False, "mensaje": "Legajo y turno son requeridos"})
+CUERPO_VALIDAR_LEGAJO_INVALIDO = orjson.dumps({"valido": False, "mensaje": "Legajo no válido"})
+CUERPO_VALIDAR_TURNO_INVALIDO = orjson.dumps({"valido": False, "mensaje": "Turno no válido para este empleado"})
+CUERPO_RECONOCIMIENTO_NO_DISPONIBLE = orjson.dumps({"exito": False, "mensaje": "Servicio de reconocimiento no disponible"})
+CUERPO_RECONOCER_FALTAN_CAMPOS = orjson.dumps({"exito": False, "mensaje": "Legajo, turno e imagen son requeridos"})
+CUERPO_RECONOCER_LEGAJO_INVALIDO = orjson.dumps({"exito": False, "mensaje": "Legajo no válido"})
+CUERPO_RECONOCER_TURNO_INVALIDO = orjson.dumps({"exito": False, "mensaje": "Turno no válido para este empleado"})
+CUERPO_SIN_EMBEDDINGS = orjson.dumps({"exito": False, "mensaje": "No hay embeddings disponibles para reconocimiento"})
+
+def respuesta_precalculada(cuerpo, status=200):
+    """Arma una respuesta a partir de un cuerpo JSON ya serializado"""
+    # Se crea un Response nuevo por request: CORS y after_request modifican sus headers
+    return app.response_class(cuerpo, status=status, mimetype="application/json")
+
+# Los validadores y el índice se construyen en el primer uso; las altas
+# posteriores se agregan en el lugar sin volver a consultar la base
+_validadores_lock = threading.RLock()
+_validadores_vigentes = False
+
+# Si la carga falla, se reintenta como mucho una vez cada tantos segundos: con
+# la base caída los requests no hacen fila detrás de una consulta que va a fallar
+INTERVALO_REINTENTO_VALIDADORES = 5.0
+_proximo_reintento_validadores = 0.0
+
+def actualizar_validadores():
+    """Función auxiliar para actualizar los validadores e índice con empleados frescos"""
+    global validador_legajo, validador_turno, _validadores_vigentes, _proximo_reintento_validadores
+    with _validadores_lock:
+        try:
+            empleados_actualizados = database_manager.obtener_todos_empleados()
+            matriz_embeddings = database_manager.obtener_matriz_embeddings()
+            
+            # Un error de la base no es una tabla vacía: no se marca como vigente
+            if empleados_actualizados is None or matriz_embeddings is None:
+                raise Exception("No se pudieron leer los empleados de la base de datos")
+            
+            # Ambos validadores comparten el mismo diccionario de empleados
+            validador_legajo = ValidadorLegajo(empleados_actualizados)
+            validador_turno = ValidadorTurno(validador_legajo.base_empleados)
+            indice_embeddings.construir_desde_matriz(*matriz_embeddings)
+            _validadores_vigentes = True
+            logger.info("Cargados %s empleados desde la base de datos", len(empleados_actualizados))
+            return True
+        except Exception as e:
+            logger.error("Error actualizando validadores: %s", e)
+            # Sin base disponible se valida contra una lista vacía y se reintenta
+            # en el primer uso después de INTERVALO_REINTENTO_VALIDADORES
+            _proximo_reintento_validadores = time.monotonic() + INTERVALO_REINTENTO_VALIDADORES
+            if validador_legajo is None:
+                validador_legajo = ValidadorLegajo([])
+                validador_turno = ValidadorTurno(validador_legajo.base_empleados)
+            return False
+
+def agregar_empleado_registrado(empleado, embedding):
+    """Suma un alta a los validadores y al índice en memoria"""
+    with _validadores_lock:
+        # Si todavía no se cargaron, la carga inicial ya va a traer al empleado
+        if not _validadores_vigentes:
+            return
+        # El diccionario es compartido: agregarlo una vez alcanza para los dos
+        validador_legajo.agregar(empleado)
+        indice_embeddings.agregar(empleado['legajo'], embedding)
+
+def obtener_validadores():
+    """Devuelve el par de validadores vigente, construyéndolo en el primer uso"""
+    # Camino rápido sin lock: una vez cargados, los validadores solo se
+    # modifican en el lugar (inserciones atómicas en su diccionario)
+    if _validadores_vigentes:
+        return validador_legajo, validador_turno
+    
+    with _validadores_lock:
+        if not _validadores_vigentes and time.monotonic() >= _proximo_reintento_validadores:
+            actualizar_validadores()
+        return validador_legajo, validador_turno
+
+def _precalentar_caches():
+    """Carga validadores, índice y conexiones apenas arranca el worker, fuera de los requests"""
+    inicio = time.perf_counter()
+    database_manager.calentar()
+    obtener_validadores()
+    logger.info("Precalentamiento completo en %.0f ms", (time.perf_counter() - inicio) * 1000)
+
+# En segundo plano: el worker acepta requests mientras tanto y el primero que
+# necesite los validadores espera en el lock en lugar de construirlos de nuevo
+threading.Thread(target=_precalentar_caches, name="precalentamiento", daemon=True).start()
 
 @app.route('/')
 def home():
@@ -61,7 +245,7 @@ def home():
         empleados_count = database_manager.contar_empleados()
         db_status = True
     except Exception as e:
-        print(f"ERROR consultando PostgreSQL: {e}")
+        logger.error("Error consultando PostgreSQL: %s", e)
         empleados_count = 0
         db_status = False
         
@@ -81,20 +265,19 @@ def home():
 
 @app.route('/ping')
 def ping():
-    print("INFO: Recibí un ping desde el cliente")
     try:
         empleados_count = database_manager.contar_empleados()
         return jsonify({
             "mensaje": "pong",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "empleados": empleados_count,
             "reconocimiento": RECONOCIMIENTO_DISPONIBLE
         })
     except Exception as e:
-        print(f"ERROR consultando PostgreSQL: {e}")
+        logger.error("Error consultando PostgreSQL: %s", e)
         return jsonify({
             "mensaje": "pong",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "empleados": 0,
             "reconocimiento": RECONOCIMIENTO_DISPONIBLE,
             "db_error": str(e)
@@ -106,23 +289,22 @@ def validar_empleado():
         data = request.get_json()
         
         if not data:
-            return jsonify({"valido": False, "mensaje": "No se recibieron datos"}), 200
+            return respuesta_precalculada(CUERPO_VALIDAR_SIN_DATOS)
             
         legajo = data.get('legajo')
         turno = data.get('turno')
         
         if not legajo or not turno:
-            return jsonify({"valido": False, "mensaje": "Legajo y turno son requeridos"}), 200
+            return respuesta_precalculada(CUERPO_VALIDAR_FALTAN_CAMPOS)
         
-        # Validar legajo
-        legajo_valido = validador_legajo.validar(legajo)
-        if not legajo_valido:
-            return jsonify({"valido": False, "mensaje": "Legajo no válido"}), 200
+        _, val_turno = obtener_validadores()
         
-        # Validar turno
-        turno_valido = validador_turno.validar(legajo, turno)
-        if not turno_valido:
-            return jsonify({"valido": False, "mensaje": "Turno no válido para este empleado"}), 200
+        # Validar legajo y turno con una sola búsqueda del empleado
+        error = val_turno.validar_legajo_y_turno(legajo, turno)
+        if error == "legajo":
+            return respuesta_precalculada(CUERPO_VALIDAR_LEGAJO_INVALIDO)
+        if error == "turno":
+            return respuesta_precalculada(CUERPO_VALIDAR_TURNO_INVALIDO)
         
         return jsonify({
             "valido": True,
@@ -132,9 +314,7 @@ def validar_empleado():
         }), 200
         
     except Exception as e:
-        print(f"ERROR en validar_empleado: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en validar_empleado: %s", e)
         return jsonify({"valido": False, "mensaje": "Error interno del servidor"}), 200
 
 @app.route('/registrar_empleado', methods=['POST'])
@@ -146,12 +326,17 @@ def registrar_empleado():
         rol = request.form.get('rol')
         turno = request.form.get('turno')
         
-        # La imagen puede venir como file o como string base64
-        imagen_file = request.files.get('imagen')
+        # Las imágenes pueden venir como files (una o varias tomas) o como string base64
+        imagenes = request.files.getlist('imagen')
         imagen_base64 = request.form.get('imagen')
         
-        # Usar la imagen que esté disponible
-        imagen = imagen_file if imagen_file else imagen_base64
+        # Usar la imagen que esté disponible; el base64 se decodifica una sola vez acá
+        if not imagenes and imagen_base64:
+            try:
+                # Acepta tanto el base64 pelado como un data URL ("data:image/jpeg;base64,...")
+                imagenes = [base64.b64decode(imagen_base64.split(',', 1)[-1])]
+            except (binascii.Error, ValueError):
+                return jsonify({"exito": False, "mensaje": "La imagen en base64 no es válida"}), 200
         
         # Validar campos obligatorios
         if not all([legajo, area, rol, turno]):
@@ -162,23 +347,35 @@ def registrar_empleado():
         if turno not in turnos_validos:
             return jsonify({"exito": False, "mensaje": f"Turno debe ser uno de: {', '.join(turnos_validos)}"}), 200
             
-        # Verificar si el legajo ya existe
-        if database_manager.empleado_existe(legajo):
+        # Rechazo temprano con el validador en memoria (sin ir a la base) para
+        # no procesar la imagen de un legajo conocido; la unicidad real la
+        # garantiza el INSERT ... ON CONFLICT de registrar_empleado
+        val_legajo, _ = obtener_validadores()
+        if val_legajo.existe(legajo):
             return jsonify({"exito": False, "mensaje": "El empleado ya existe"}), 200
             
         # Procesar imagen y embedding
-        if RECONOCIMIENTO_DISPONIBLE and imagen:
+        if RECONOCIMIENTO_DISPONIBLE and imagenes:
             try:
-                # Generar embedding de la imagen
-                embedding = generarEmbedding(imagen)
+                # Leer los uploads en este hilo y mandar solo los bytes al pool;
+                # con varias tomas se registra el promedio de sus embeddings
+                imagenes_bytes = [leer_bytes_imagen(imagen) for imagen in imagenes]
+                embedding = ejecutar_en_pool(generar_embedding_promedio, imagenes_bytes)
                 if embedding is None:
                     return jsonify({"exito": False, "mensaje": "No se pudo procesar la imagen facial"}), 200
+                
+                # Convertir una sola vez a float32 y validar forma y valores
+                embedding = validar_embedding(embedding)
+                if embedding is None:
+                    return jsonify({"exito": False, "mensaje": "Embedding facial inválido"}), 200
+            except ServidorOcupado:
+                return respuesta_precalculada(CUERPO_OCUPADO, 429)
             except Exception as e:
-                print(f"ERROR procesando imagen: {e}")
+                logger.error("Error procesando imagen: %s", e)
                 return jsonify({"exito": False, "mensaje": "Error procesando la imagen facial"}), 200
         else:
             # Usar embedding dummy si no hay reconocimiento o imagen
-            embedding = [0.0] * 128
+            embedding = np.zeros(128, dtype=np.float32)
             
         # Registrar empleado en la base de datos
         resultado = database_manager.registrar_empleado(
@@ -189,9 +386,15 @@ def registrar_empleado():
             embedding=embedding
         )
         
+        if resultado is None:
+            return jsonify({"exito": False, "mensaje": "El empleado ya existe"}), 200
+        
         if resultado:
-            # Actualizar validadores con el nuevo empleado
-            actualizar_validadores()
+            # Validadores e índice se actualizan en el lugar, sin releer la tabla
+            agregar_empleado_registrado(
+                {"legajo": legajo, "area": area, "rol": rol, "turno": turno},
+                embedding
+            )
             
             return jsonify({
                 "exito": True,
@@ -200,22 +403,20 @@ def registrar_empleado():
                 "area": area,
                 "rol": rol,
                 "turno": turno,
-                "modo": "con_reconocimiento" if RECONOCIMIENTO_DISPONIBLE and imagen else "sin_reconocimiento"
+                "modo": "con_reconocimiento" if RECONOCIMIENTO_DISPONIBLE and imagenes else "sin_reconocimiento"
             }), 200
         else:
             return jsonify({"exito": False, "mensaje": "Error al registrar empleado en la base de datos"}), 200
             
     except Exception as e:
-        print(f"ERROR en registrar_empleado: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en registrar_empleado: %s", e)
         return jsonify({"exito": False, "mensaje": f"Error interno: {str(e)}"}), 200
 
 @app.route('/reconocer', methods=['POST'])
 def reconocer():
     try:
         if not RECONOCIMIENTO_DISPONIBLE:
-            return jsonify({"exito": False, "mensaje": "Servicio de reconocimiento no disponible"}), 200
+            return respuesta_precalculada(CUERPO_RECONOCIMIENTO_NO_DISPONIBLE)
             
         # Obtener datos
         legajo = request.form.get('legajo')
@@ -223,34 +424,37 @@ def reconocer():
         imagen = request.files.get('imagen')
         
         if not all([legajo, turno, imagen]):
-            return jsonify({"exito": False, "mensaje": "Legajo, turno e imagen son requeridos"}), 200
+            return respuesta_precalculada(CUERPO_RECONOCER_FALTAN_CAMPOS)
         
-        # Validar legajo y turno
-        if not validador_legajo.validar(legajo):
-            return jsonify({"exito": False, "mensaje": "Legajo no válido"}), 200
-            
-        if not validador_turno.validar(legajo, turno):
-            return jsonify({"exito": False, "mensaje": "Turno no válido para este empleado"}), 200
+        # Validar legajo y turno con una sola búsqueda del empleado
+        _, val_turno = obtener_validadores()
         
-        # Obtener embeddings de todos los empleados
-        empleados_embeddings = {}
-        empleados = database_manager.obtener_todos_empleados()
+        error = val_turno.validar_legajo_y_turno(legajo, turno)
+        if error == "legajo":
+            return respuesta_precalculada(CUERPO_RECONOCER_LEGAJO_INVALIDO)
+        if error == "turno":
+            return respuesta_precalculada(CUERPO_RECONOCER_TURNO_INVALIDO)
         
-        if not empleados:
-            return jsonify({"exito": False, "mensaje": "No hay empleados registrados"}), 200
+        if database_manager.pgvector_disponible:
+            # La búsqueda del más cercano la resuelve PostgreSQL con el índice HNSW
+            buscar = database_manager.buscar_mas_cercano
+        else:
+            # El índice se carga junto con los validadores (si la base no respondió,
+            # obtener_validadores reintenta cada INTERVALO_REINTENTO_VALIDADORES
+            # segundos) y las altas se le agregan en el lugar
+            if len(indice_embeddings) == 0:
+                return respuesta_precalculada(CUERPO_SIN_EMBEDDINGS)
             
-        for empleado in empleados:
-            if empleado.get('embedding'):
-                empleados_embeddings[empleado['legajo']] = empleado['embedding']
-        
-        if not empleados_embeddings:
-            return jsonify({"exito": False, "mensaje": "No hay embeddings disponibles para reconocimiento"}), 200
+            buscar = indice_embeddings.buscar
         
         # Reconocer empleado
         try:
-            empleado_reconocido, distancia = reconocer_empleado(imagen, empleados_embeddings)
+            imagen_bytes = leer_bytes_imagen(imagen)
+            empleado_reconocido, distancia = ejecutar_en_pool(reconocer_empleado, imagen_bytes, buscar)
+        except ServidorOcupado:
+            return respuesta_precalculada(CUERPO_OCUPADO, 429)
         except Exception as e:
-            print(f"ERROR en reconocimiento facial: {e}")
+            logger.error("Error en reconocimiento facial: %s", e)
             return jsonify({"exito": False, "mensaje": "Error en el proceso de reconocimiento facial"}), 200
         
         if empleado_reconocido == legajo:
@@ -265,10 +469,10 @@ def reconocer():
                     "reconocido": True,
                     "distancia": float(distancia) if distancia is not None else None,
                     "asistencia_registrada": resultado,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now()
                 }), 200
             except Exception as e:
-                print(f"ERROR registrando asistencia: {e}")
+                logger.error("Error registrando asistencia: %s", e)
                 return jsonify({
                     "exito": True,
                     "mensaje": "Empleado reconocido, pero error registrando asistencia",
@@ -276,7 +480,7 @@ def reconocer():
                     "reconocido": True,
                     "distancia": float(distancia) if distancia is not None else None,
                     "asistencia_registrada": False,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now()
                 }), 200
         else:
             return jsonify({
@@ -289,42 +493,31 @@ def reconocer():
             }), 200
             
     except Exception as e:
-        print(f"ERROR en reconocer: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en reconocer: %s", e)
         return jsonify({"exito": False, "mensaje": f"Error interno: {str(e)}"}), 200
 
 @app.route('/dashboard', methods=['GET'])
 def get_dashboard():
     try:
-        # Obtener estadísticas básicas
-        total_empleados = database_manager.contar_empleados()
-        
-        # Obtener todos los empleados para análisis de turnos
-        empleados = database_manager.obtener_todos_empleados()
-        
-        # Contar empleados por turno
-        turnos = {'mañana': 0, 'tarde': 0, 'noche': 0}
-        for empleado in empleados:
-            turno = empleado.get('turno', '').lower()
-            if turno in turnos:
-                turnos[turno] += 1
+        # Contar empleados por turno en la base, sin traer los empleados;
+        # el total exacto sale de la misma consulta
+        conteo_turnos = database_manager.contar_por_turno()
+        turnos = {turno: conteo_turnos.get(turno, 0) for turno in ('mañana', 'tarde', 'noche')}
+        total_empleados = sum(conteo_turnos.values())
         
-        # Obtener asistencias de hoy (simulado por ahora)
-        from datetime import date
+        # Asistencias de los últimos 7 días en una sola consulta agrupada
         today = date.today()
-        asistencias_hoy = 0  # Por ahora simulado
+        desde = today - timedelta(days=6)
+        asistencias_por_dia = registrar_asistencias.contar_asistencias_por_dia(desde)
+        asistencias_hoy = asistencias_por_dia.get(today, 0)
         
-        # Generar datos de asistencias de los últimos 7 días (simulado)
-        from datetime import datetime, timedelta
+        # Completar los días sin registros
         asistencias_semana = []
         for i in range(7):
-            fecha = today - timedelta(days=6-i)
-            # Por ahora datos simulados - puedes implementar lógica real después
-            count = min(total_empleados, max(0, total_empleados - (i % 3)))
+            fecha = desde + timedelta(days=i)
             asistencias_semana.append({
-                'fecha': fecha.isoformat(),
-                'count': count
+                'fecha': fecha,
+                'count': asistencias_por_dia.get(fecha, 0)
             })
         
         return jsonify({
@@ -336,43 +529,57 @@ def get_dashboard():
         })
         
     except Exception as e:
-        print(f"ERROR en dashboard: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en dashboard: %s", e)
         return jsonify({
             'exito': False,
             'mensaje': f'Error interno: {str(e)}'
         }), 200
 
+# (lista de empleados, su JSON, su ETag) del último listado servido
+_cuerpo_empleados = (None, None, None)
+
 @app.route('/empleados', methods=['GET'])
 def obtener_empleados():
     try:
-        empleados = database_manager.obtener_todos_empleados()
+        # Listado proyectado en la consulta: la columna embedding no sale de la base
+        empleados_sin_embedding = database_manager.obtener_empleados_meta()
+        
+        # Mientras el DatabaseManager devuelva la misma lista cacheada se
+        # reutilizan los bytes ya serializados y su ETag
+        global _cuerpo_empleados
+        lista_serializada, cuerpo, etag = _cuerpo_empleados
+        if lista_serializada is not empleados_sin_embedding:
+            cuerpo = orjson.dumps({
+                "empleados": empleados_sin_embedding,
+                "total": len(empleados_sin_embedding)
+            })
+            # El ETag sale del contenido: cambia con cualquier alta o baja,
+            # la haga este proceso, otra instancia o alguien desde psql
+            etag = hashlib.blake2b(cuerpo, digest_size=16).hexdigest()
+            _cuerpo_empleados = (empleados_sin_embedding, cuerpo, etag)
         
-        # Remover embeddings de la respuesta (son muy largos)
-        empleados_sin_embedding = []
-        for emp in empleados:
-            emp_limpio = {k: v for k, v in emp.items() if k != 'embedding'}
-            # Formatear fecha si existe
-            if emp_limpio.get('fecha_registro'):
-                emp_limpio['fecha_registro'] = emp_limpio['fecha_registro'].isoformat()
-            empleados_sin_embedding.append(emp_limpio)
+        # Si el cliente ya tiene esta versión del listado, no se vuelve a mandar
+        if request.if_none_match.contains_weak(etag):
+            respuesta = app.response_class(status=304)
+            respuesta.set_etag(etag, weak=True)
+            return respuesta
             
-        return jsonify({
-            "empleados": empleados_sin_embedding,
-            "total": len(empleados_sin_embedding)
-        })
+        respuesta = respuesta_precalculada(cuerpo)
+        respuesta.set_etag(etag, weak=True)
+        # Que el navegador revalide siempre en lugar de usar su copia a ciegas
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
         
     except Exception as e:
-        print(f"ERROR en obtener_empleados: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en obtener_empleados: %s", e)
         return jsonify({"error": "Error interno del servidor"}), 500
 
 @app.route('/asistencias/<legajo>', methods=['GET'])
 def obtener_asistencias(legajo):
     try:
-        if not validador_legajo.validar(legajo):
+        val_legajo, _ = obtener_validadores()
+        
+        if not val_legajo.existe(legajo):
             return jsonify({"error": "Legajo no válido"}), 404
             
         asistencias = registrar_asistencias.obtener_asistencias_empleado(legajo)
@@ -384,9 +591,7 @@ def obtener_asistencias(legajo):
         })
         
     except Exception as e:
-        print(f"ERROR en obtener_asistencias: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en obtener_asistencias: %s", e)
         return jsonify({"error": "Error interno del servidor"}), 500
 
 # Endpoint de debug
@@ -398,16 +603,20 @@ def debug():
         "database_ok": database_manager is not None,
         "validadores_ok": validador_legajo is not None and validador_turno is not None,
         "asistencias_ok": registrar_asistencias is not None,
-        "total_empleados": len(database_manager.obtener_todos_empleados()) if database_manager else 0
+        "total_empleados": database_manager.contar_empleados() if database_manager else 0
     })
 
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint no encontrado"}), 404
 
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({"exito": False, "mensaje": "La imagen supera el tamaño máximo permitido (10 MB)"}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
-    print(f"ERROR interno del servidor: {error}")
+    logger.error("Error interno del servidor: %s", error)
     return jsonify({"error": "Error interno del servidor"}), 500
 
 if __name__ == '__main__':
@@ -1,17 +1,26 @@
 import cv2
 
+# La detección corre sobre una copia de este ancho: Haar escala con los píxeles
+ANCHO_DETECCION = 320
+
 class CapturadorFrame:
+    # Compartido por todas las instancias: cargar el XML del cascade es caro
+    face_cascade = cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    )
+
     def __init__(self, timeout=5):
         self.timeout = timeout
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
 
     def capturar(self):
         cap = cv2.VideoCapture(0)
         if not cap.isOpened():
             return {"exito": False, "mensaje": "No se pudo abrir la cámara", "frame": None}
 
+        # Pedir 640x480 a la cámara: alcanza para la foto y mueve menos datos por frame
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+
         frame_detectado = None
         start_time = cv2.getTickCount() / cv2.getTickFrequency()
 
@@ -21,7 +30,10 @@ class CapturadorFrame:
                 break
 
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+            escala = ANCHO_DETECCION / gray.shape[1]
+            if escala < 1:
+                gray = cv2.resize(gray, (0, 0), fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+            faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(20, 20))
 
             if len(faces) > 0:
                 frame_detectado = frame
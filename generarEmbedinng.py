@@ -1,12 +1,70 @@
 # generarEmbedding.py - Versión sin sklearn para evitar errores de importación
 import cv2
 import numpy as np
-from PIL import Image
-import io
+import os
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Limitar el pool interno de OpenCV: las imágenes ya se procesan en paralelo
+# desde el pool de la app, y sin tope ambos pools compiten por los mismos núcleos
+cv2.setNumThreads(max(1, (os.cpu_count() or 1) // 2))
+
+# Asegurar las rutas SIMD de OpenCV (pueden venir desactivadas por configuración)
+cv2.setUseOptimized(True)
 
 # Inicializar detector de caras de OpenCV
 face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
+# Dimensión de los embeddings guardados (empleados.embedding y columna pgvector)
+DIMENSION_EMBEDDING = 128
+
+# Lado máximo de la imagen que llega al detector: más píxeles no mejoran la
+# detección y el costo de Haar crece con el área. Solo se reduce la copia
+# para detectar; las características salen de la imagen original
+MAX_LADO_DETECCION = 800
+
+# Caché corto de embeddings por contenido: los reintentos con la misma foto
+# no vuelven a decodificar ni a detectar la cara
+TTL_CACHE_EMBEDDINGS = 10.0
+MAX_CACHE_EMBEDDINGS = 512
+_cache_embeddings = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _leer_cache_embedding(clave):
+    """Devuelve (encontrado, embedding) para la clave si no venció"""
+    ahora = time.monotonic()
+    with _cache_lock:
+        entrada = _cache_embeddings.get(clave)
+        if entrada is None:
+            return False, None
+        if ahora - entrada[0] > TTL_CACHE_EMBEDDINGS:
+            del _cache_embeddings[clave]
+            return False, None
+        return True, entrada[1]
+
+def _guardar_cache_embedding(clave, embedding):
+    """Guarda el embedding (o None si no hubo cara) descartando los más viejos"""
+    with _cache_lock:
+        _cache_embeddings[clave] = (time.monotonic(), embedding)
+        _cache_embeddings.move_to_end(clave)
+        while len(_cache_embeddings) > MAX_CACHE_EMBEDDINGS:
+            _cache_embeddings.popitem(last=False)
+
+def decodificar_imagen_gris(imagen_bytes):
+    """
+    Decodifica la imagen directamente a escala de grises con OpenCV
+
+    Siempre a resolución completa: las características de la cara salen de
+    estos píxeles y tienen que coincidir con las de los embeddings guardados
+    """
+    npimg = np.frombuffer(imagen_bytes, np.uint8)
+    return cv2.imdecode(npimg, cv2.IMREAD_GRAYSCALE)
+
 def extraer_caracteristicas_cara(imagen_gris, x, y, w, h):
     """
     Extrae características básicas de una cara detectada
@@ -24,97 +82,189 @@ def extraer_caracteristicas_cara(imagen_gris, x, y, w, h):
     grad_x = cv2.Sobel(cara_resize, cv2.CV_64F, 1, 0, ksize=3)
     grad_y = cv2.Sobel(cara_resize, cv2.CV_64F, 0, 1, ksize=3)
     
-    # Características estadísticas
-    caracteristicas = []
+    # Cada estadística sale de una sola pasada nativa de OpenCV en lugar de
+    # una reducción de numpy por valor
+    media_x, desvio_x = cv2.meanStdDev(grad_x)
+    media_y, desvio_y = cv2.meanStdDev(grad_y)
+    media_cara, desvio_cara = cv2.meanStdDev(cara_resize)
+    minimo, maximo, _, _ = cv2.minMaxLoc(cara_resize)
+    pixeles = cara_resize.size
+    
+    caracteristicas = np.empty(hist.size + 10)
     
     # Del histograma (normalizado)
-    caracteristicas.extend(hist.flatten() / np.sum(hist))
+    caracteristicas[:hist.size] = hist.ravel() / pixeles
     
-    # De los gradientes
-    caracteristicas.extend([
-        np.mean(grad_x), np.std(grad_x),
-        np.mean(grad_y), np.std(grad_y),
-        np.mean(np.abs(grad_x)), np.mean(np.abs(grad_y))
-    ])
+    # De los gradientes y estadísticas básicas de la imagen
+    caracteristicas[hist.size:] = (
+        media_x[0, 0], desvio_x[0, 0],
+        media_y[0, 0], desvio_y[0, 0],
+        cv2.norm(grad_x, cv2.NORM_L1) / pixeles, cv2.norm(grad_y, cv2.NORM_L1) / pixeles,
+        media_cara[0, 0], desvio_cara[0, 0],
+        minimo, maximo
+    )
     
-    # Estadísticas básicas de la imagen
-    caracteristicas.extend([
-        np.mean(cara_resize), np.std(cara_resize),
-        np.min(cara_resize), np.max(cara_resize)
-    ])
+    return caracteristicas
+
+def leer_bytes_imagen(imagen):
+    """
+    Obtiene los bytes de una imagen subida
+    """
+    if isinstance(imagen, (bytes, bytearray, memoryview)):
+        return imagen
     
-    return np.array(caracteristicas)
+    stream = getattr(imagen, 'stream', imagen)
+    
+    # Una sola copia con getvalue() y no una vista con getbuffer(): la vista
+    # fija el BytesIO del request y, si el trabajo sigue vivo tras un timeout,
+    # el close() de werkzeug falla con BufferError
+    if hasattr(stream, 'getvalue'):
+        return stream.getvalue()
+        
+    return stream.read()
 
 def generarEmbedding(imagen_file):
+    """
+    Genera embedding facial a partir de un archivo subido o de sus bytes
+    
+    El resultado se reutiliza durante TTL_CACHE_EMBEDDINGS segundos para
+    la misma imagen (clave BLAKE2b del contenido).
+    """
+    imagen_bytes = leer_bytes_imagen(imagen_file)
+    clave = hashlib.blake2b(imagen_bytes, digest_size=16).digest()
+    
+    encontrado, embedding = _leer_cache_embedding(clave)
+    if encontrado:
+        return embedding
+    
+    embedding = generar_embedding_desde_bytes(imagen_bytes)
+    if embedding is not None:
+        # Compartido entre requests: que nadie lo modifique en el lugar
+        embedding.flags.writeable = False
+    _guardar_cache_embedding(clave, embedding)
+    return embedding
+
+def validar_embedding(embedding):
+    """
+    Verifica que un embedding tenga la forma esperada y valores finitos
+    
+    Args:
+        embedding (list or np.ndarray): Embedding a validar
+        
+    Returns:
+        np.ndarray or None: El embedding como float32 (sin copia si ya lo era) o None si no es válido
+    """
+    arr = np.asarray(embedding, dtype=np.float32)
+    if arr.shape != (DIMENSION_EMBEDDING,) or not np.isfinite(arr).all():
+        return None
+    return arr
+
+def generar_embedding_promedio(imagenes):
+    """
+    Genera un único embedding a partir de varias fotos del mismo empleado
+    
+    Cada embedding ya viene L2-normalizado; el promedio se vuelve a
+    normalizar para que la plantilla tenga la misma escala que una sola foto.
+    Las fotos en las que no se detecta cara se descartan.
+    
+    Args:
+        imagenes (list): Archivos subidos o bytes de cada foto
+        
+    Returns:
+        np.ndarray or None: Embedding promedio o None si ninguna foto sirvió
+    """
+    embeddings = [e for e in (generarEmbedding(imagen) for imagen in imagenes) if e is not None]
+    if not embeddings:
+        return None
+    
+    if len(embeddings) == 1:
+        return embeddings[0]
+    
+    promedio = np.mean(embeddings, axis=0, dtype=np.float32)
+    return promedio / (np.linalg.norm(promedio) + 1e-8)
+
+def generar_embedding_desde_bytes(imagen_bytes):
     """
     Genera embedding facial usando OpenCV y análisis estadístico
     """
     try:
-        # Leer imagen
-        imagen_bytes = imagen_file.read()
-        imagen = Image.open(io.BytesIO(imagen_bytes))
+        # Decodificar imagen en escala de grises
+        imagen_gris = decodificar_imagen_gris(imagen_bytes)
+        
+        if imagen_gris is None:
+            logger.warning("No se pudo decodificar la imagen")
+            return None
         
-        # Convertir a numpy array y escala de grises
-        imagen_rgb = np.array(imagen.convert('RGB'))
-        imagen_gris = cv2.cvtColor(imagen_rgb, cv2.COLOR_RGB2GRAY)
+        lado = max(imagen_gris.shape[:2])
+        escala = 1.0
+        imagen_deteccion = imagen_gris
+        if lado > MAX_LADO_DETECCION:
+            escala = MAX_LADO_DETECCION / lado
+            imagen_deteccion = cv2.resize(imagen_gris, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
         
         # Detectar caras con parámetros menos estrictos
         caras = face_cascade.detectMultiScale(
-            imagen_gris, 
+            imagen_deteccion, 
             scaleFactor=1.05,  # Más sensible (era 1.1)
             minNeighbors=3,    # Menos estricto (era 5)  
             minSize=(20, 20)   # Caras más pequeñas (era 30, 30)
         )
         
         if len(caras) == 0:
-            print("No se detectó ninguna cara en la imagen")
+            logger.warning("No se detectó ninguna cara en la imagen")
             return None
             
         # Tomar la cara más grande
         cara_principal = max(caras, key=lambda c: c[2] * c[3])
         x, y, w, h = cara_principal
         
+        if escala != 1.0:
+            # Llevar el recuadro a la resolución original para recortar la cara
+            # con todos sus píxeles, como en los embeddings ya guardados
+            alto, ancho = imagen_gris.shape[:2]
+            x, y = int(x / escala), int(y / escala)
+            w = min(int(round(w / escala)), ancho - x)
+            h = min(int(round(h / escala)), alto - y)
+        
         # Extraer características
         caracteristicas = extraer_caracteristicas_cara(imagen_gris, x, y, w, h)
         
-        # Reducir dimensionalidad a 128 usando selección manual
-        if len(caracteristicas) > 128:
+        # Reducir dimensionalidad a 128 usando selección manual. Es la misma
+        # selección con la que se generaron los embeddings ya guardados: cambiarla
+        # obliga a volver a registrar a todos los empleados
+        if len(caracteristicas) > DIMENSION_EMBEDDING:
             # Tomar las características más significativas
-            indices = np.argsort(np.abs(caracteristicas))[-128:]
+            indices = np.argsort(np.abs(caracteristicas))[-DIMENSION_EMBEDDING:]
             embedding = caracteristicas[indices]
         else:
             # Pad con ceros si es necesario
-            embedding = np.pad(caracteristicas, (0, max(0, 128 - len(caracteristicas))))
+            embedding = np.pad(caracteristicas, (0, max(0, DIMENSION_EMBEDDING - len(caracteristicas))))
         
-        # Normalizar
+        # Normalizar y devolver empaquetado como float32 (sin floats de Python)
         embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
         
-        return embedding.tolist()
+        return embedding.astype(np.float32)
         
     except Exception as e:
-        print(f"Error generando embedding: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generando embedding: %s", e)
         return None
 
-def calcular_distancia_euclidiana(embedding1, embedding2):
+def precalentar():
     """
-    Calcula distancia euclidiana entre dos embeddings
+    Ejecuta el pipeline una vez sobre una imagen sintética para que la carga
+    perezosa de OpenCV (cascada, pool de hilos, buffers) ocurra al iniciar
+    el worker y no en el primer request
     """
-    try:
-        emb1 = np.array(embedding1)
-        emb2 = np.array(embedding2)
-        
-        distancia = np.linalg.norm(emb1 - emb2)
-        return distancia
-        
-    except Exception as e:
-        print(f"Error calculando distancia: {e}")
-        return 1.0
+    imagen = np.full((160, 160), 128, dtype=np.uint8)
+    face_cascade.detectMultiScale(imagen, scaleFactor=1.05, minNeighbors=3, minSize=(20, 20))
+    extraer_caracteristicas_cara(imagen, 0, 0, 160, 160)
 
-def reconocer_empleado(imagen_file, empleados_embeddings, umbral=0.6):
+def reconocer_empleado(imagen_file, buscar, umbral=0.6):
     """
-    Reconoce empleado comparando con embeddings guardados
+    Reconoce empleado buscando su embedding más cercano
+
+    buscar recibe el embedding y devuelve (legajo, distancia): el índice en
+    memoria o la búsqueda pgvector de DatabaseManager
     """
     try:
         # Generar embedding de la imagen nueva
@@ -122,16 +272,10 @@ def reconocer_empleado(imagen_file, empleados_embeddings, umbral=0.6):
         if nuevo_embedding is None:
             return None, 1.0
             
-        mejor_match = None
-        menor_distancia = float('inf')
-        
-        # Comparar con todos los empleados
-        for legajo, embedding_guardado in empleados_embeddings.items():
-            distancia = calcular_distancia_euclidiana(nuevo_embedding, embedding_guardado)
-            
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-                mejor_match = legajo
+        # Comparar con todos los empleados en una sola operación
+        mejor_match, menor_distancia = buscar(nuevo_embedding)
+        if mejor_match is None:
+            return None, 1.0
                 
         # Verificar si está dentro del umbral
         if menor_distancia <= umbral:
@@ -140,7 +284,5 @@ def reconocer_empleado(imagen_file, empleados_embeddings, umbral=0.6):
             return None, menor_distancia
             
     except Exception as e:
-        print(f"Error en reconocimiento: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en reconocimiento: %s", e)
         return None, 1.0
@@ -1,153 +1,501 @@
 import psycopg2
-import json
+import psycopg2.errors
+import psycopg2.extras
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
+import orjson
+import numpy as np
 import os
+import re
+import time
+import atexit
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Las columnas JSONB llegan ya decodificadas, con orjson en lugar del json estándar
+psycopg2.extras.register_default_jsonb(globally=True, loads=orjson.loads)
+
+class ConexionPreparada(psycopg2.extensions.connection):
+    """Conexión que recuerda qué sentencias ya preparó en el servidor"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preparadas = set()
+        # Se activa si PREPARE/EXECUTE no funcionan en esta conexión (p. ej. detrás
+        # de PgBouncer en modo transacción): desde ahí se ejecuta sin preparar
+        self.sin_preparar = False
+
+def _ejecutar_directa(cursor, sql, parametros):
+    """Ejecuta una sentencia escrita con $1, $2, ... como consulta común"""
+    cursor.execute(re.sub(r"\$(\d+)", r"%(p\1)s", sql),
+                   {f"p{i}": valor for i, valor in enumerate(parametros, 1)})
+
+def ejecutar_preparada(cursor, nombre, sql, parametros):
+    """
+    Ejecuta una sentencia preparada del lado del servidor
+    
+    La primera vez en cada conexión se hace PREPARE (parseo y planificación);
+    las siguientes solo EXECUTE. La conexión tiene que venir de un pool creado
+    con connection_factory=ConexionPreparada.
+    
+    Si el servidor perdió la sentencia (reinicio, DISCARD ALL) se vuelve a
+    preparar una vez; si tampoco así funciona (un pooler que reparte PREPARE y
+    EXECUTE en conexiones distintas) la conexión pasa a ejecutar sin preparar.
+    
+    Args:
+        cursor: Cursor sobre una ConexionPreparada
+        nombre (str): Nombre de la sentencia, único por conexión
+        sql (str): Sentencia con parámetros $1, $2, ...
+        parametros (tuple): Valores en el orden de los $n
+    """
+    conexion = cursor.connection
+    if conexion.sin_preparar:
+        _ejecutar_directa(cursor, sql, parametros)
+        return
+    
+    marcadores = ", ".join(["%s"] * len(parametros))
+    for _ in range(2):
+        try:
+            if nombre not in conexion.preparadas:
+                cursor.execute(f"PREPARE {nombre} AS {sql}")
+                conexion.preparadas.add(nombre)
+            
+            cursor.execute(f"EXECUTE {nombre} ({marcadores})", parametros)
+            return
+        except psycopg2.errors.InvalidSqlStatementName:
+            # El servidor ya no la tiene: lo que se sabía de esta conexión no vale
+            conexion.preparadas.clear()
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # El servidor ya la tenía preparada aunque esta conexión no lo supiera
+            conexion.preparadas.add(nombre)
+    
+    logger.warning("Sentencias preparadas no disponibles en esta conexión, se ejecuta sin preparar")
+    conexion.sin_preparar = True
+    _ejecutar_directa(cursor, sql, parametros)
+
 class DatabaseManager:
+    # Segundos durante los que se reutiliza el listado de empleados
+    TTL_CACHE_EMPLEADOS = 5.0
+    
+    # Por debajo de esta cantidad estimada se cuenta exacto: en una tabla chica
+    # COUNT(*) es barato y reltuples puede quedar viejo hasta el próximo ANALYZE
+    UMBRAL_CONTEO_ESTIMADO = 10000
+    
+    # Conexiones abiertas que se reutilizan entre requests (gthread atiende varios a la vez)
+    MIN_CONEXIONES = 1
+    MAX_CONEXIONES = 20
+    
     def __init__(self):
         """Inicializa la conexión con la base de datos PostgreSQL"""
+        self._cache_empleados = {"t": 0.0, "v": None}
+        self._cache_meta = {"t": 0.0, "v": None}
+        # Se incrementa en cada alta/baja; una lectura que se cruzó con un cambio no se cachea
+        self._version_empleados = 0
+        # Se activa en _crear_tablas si la base tiene la extensión pgvector
+        self.pgvector_disponible = False
+        
         try:
             # Obtener URL de conexión desde variable de entorno
             self.database_url = os.environ.get('DATABASE_URL')
             if not self.database_url:
                 raise Exception("DATABASE_URL no encontrada en variables de entorno")
             
-            # Establecer conexión
-            self.connection = psycopg2.connect(self.database_url)
-            self.connection.autocommit = True
+            # Pool de conexiones: cada consulta toma una conexión ya abierta
+            self.pool = ThreadedConnectionPool(
+                self.MIN_CONEXIONES, self.MAX_CONEXIONES, self.database_url,
+                connection_factory=ConexionPreparada
+            )
+            
+            # Cerrar el pool al terminar el proceso (en lugar de depender de __del__)
+            atexit.register(self.cerrar_conexion)
             
             # Crear tablas si no existen
             self._crear_tablas()
             
         except Exception as e:
-            print(f"ERROR conectando a PostgreSQL: {e}")
+            logger.error("Error conectando a PostgreSQL: %s", e)
             raise e
     
+    @contextmanager
+    def _cursor(self):
+        """Presta una conexión del pool (en autocommit) y devuelve un cursor sobre ella"""
+        connection = self.pool.getconn()
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                yield cursor
+        finally:
+            # Una conexión caída se descarta en lugar de volver al pool
+            self.pool.putconn(connection, close=bool(connection.closed))
+    
+    @contextmanager
+    def _cursor_servidor(self, nombre, filas_por_lote=1000):
+        """
+        Presta una conexión del pool y devuelve un cursor del lado del servidor
+        Las filas llegan de a filas_por_lote al iterarlo, sin materializar todo
+        el resultado en el cliente como fetchall()
+        """
+        connection = self.pool.getconn()
+        try:
+            # Un cursor con nombre solo existe dentro de una transacción
+            connection.autocommit = False
+            try:
+                with connection.cursor(name=nombre) as cursor:
+                    cursor.itersize = filas_por_lote
+                    yield cursor
+            finally:
+                if not connection.closed:
+                    connection.rollback()
+        finally:
+            self.pool.putconn(connection, close=bool(connection.closed))
+    
     def _crear_tablas(self):
         """Crea las tablas necesarias si no existen"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Tabla de empleados
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS empleados (
-                    legajo VARCHAR(50) PRIMARY KEY,
-                    area VARCHAR(100) NOT NULL,
-                    rol VARCHAR(100) NOT NULL,
-                    turno VARCHAR(20) NOT NULL CHECK (turno IN ('mañana', 'tarde', 'noche')),
-                    embedding JSONB NOT NULL,
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Tabla de asistencias
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS asistencias (
-                    id SERIAL PRIMARY KEY,
-                    legajo VARCHAR(50) NOT NULL,
-                    turno VARCHAR(20) NOT NULL,
-                    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('entrada', 'salida')),
-                    fecha DATE NOT NULL,
-                    hora TIME NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (legajo) REFERENCES empleados(legajo)
-                )
-            """)
-            
-            cursor.close()
-            
-        except Exception as e:
-            print(f"ERROR creando tablas: {e}")
+            with self._cursor() as cursor:
+                # Tabla de empleados
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS empleados (
+                        legajo VARCHAR(50) PRIMARY KEY,
+                        area VARCHAR(100) NOT NULL,
+                        rol VARCHAR(100) NOT NULL,
+                        turno VARCHAR(20) NOT NULL CHECK (turno IN ('mañana', 'tarde', 'noche')),
+                        embedding JSONB NOT NULL,
+                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Tabla de asistencias
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS asistencias (
+                        id SERIAL PRIMARY KEY,
+                        legajo VARCHAR(50) NOT NULL,
+                        turno VARCHAR(20) NOT NULL,
+                        tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('entrada', 'salida')),
+                        fecha DATE NOT NULL,
+                        hora TIME NOT NULL,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (legajo) REFERENCES empleados(legajo)
+                    )
+                """)
+                
+                # Índices de asistencias; las columnas INCLUDE permiten responder
+                # cada consulta desde el índice sin visitar la tabla:
+                # último tipo del día de un empleado (registrar)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_asistencias_legajo_fecha 
+                    ON asistencias (legajo, fecha, timestamp DESC) INCLUDE (tipo)
+                """)
+                # historial y último registro de un empleado
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_asistencias_legajo_ts 
+                    ON asistencias (legajo, timestamp DESC) INCLUDE (turno, tipo, fecha, hora)
+                """)
+                # asistencias de un día y conteo de entradas por día (dashboard)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_asistencias_fecha 
+                    ON asistencias (fecha, legajo) INCLUDE (tipo)
+                """)
+                
+        except Exception as e:
+            logger.error("Error creando tablas: %s", e)
             raise e
+        
+        self._configurar_pgvector()
+    
+    def _configurar_pgvector(self):
+        """
+        Si el servidor tiene pgvector, agrega una columna vector(128) con índice
+        HNSW para que la búsqueda del empleado más cercano se haga en PostgreSQL.
+        Sin la extensión la aplicación sigue usando el índice en memoria.
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cursor.execute("ALTER TABLE empleados ADD COLUMN IF NOT EXISTS emb vector(128)")
+                
+                # Completar la columna para los empleados registrados antes de activarla
+                cursor.execute("""
+                    UPDATE empleados SET emb = embedding::text::vector 
+                    WHERE emb IS NULL AND jsonb_array_length(embedding) = 128
+                """)
+            
+            self.pgvector_disponible = True
+            logger.info("pgvector disponible, búsqueda de embeddings en PostgreSQL")
+            
+        except Exception as e:
+            logger.warning("pgvector no disponible, se usa el índice en memoria: %s", e)
+            self.pgvector_disponible = False
+            return
+        
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_empleados_emb 
+                    ON empleados USING hnsw (emb vector_cosine_ops)
+                """)
+        except Exception as e:
+            # Versiones de pgvector anteriores a 0.5 no tienen HNSW: se busca sin índice
+            logger.warning("No se pudo crear el índice HNSW de embeddings: %s", e)
     
     def obtener_todos_empleados(self):
         """
         Obtiene todos los empleados de la base de datos
-        Retorna una lista de diccionarios con la información de cada empleado
+        Retorna una lista de diccionarios con la información de cada empleado,
+        o None si la consulta falló (distinto de una tabla vacía)
+        El resultado se reutiliza durante TTL_CACHE_EMPLEADOS segundos
         """
+        cache = self._cache_empleados
+        if cache["v"] is not None and time.monotonic() - cache["t"] < self.TTL_CACHE_EMPLEADOS:
+            return cache["v"]
+        
+        version = self._version_empleados
+        
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT legajo, area, rol, turno, embedding, fecha_registro 
-                FROM empleados 
-                ORDER BY legajo
-            """)
+            with self._cursor_servidor("empleados_completos") as cursor:
+                cursor.execute("""
+                    SELECT legajo, area, rol, turno, embedding, fecha_registro 
+                    FROM empleados 
+                    ORDER BY legajo
+                """)
+                
+                empleados = []
+                for row in cursor:
+                    empleado = {
+                        'legajo': row[0],
+                        'area': row[1],
+                        'rol': row[2],
+                        'turno': row[3],
+                        'embedding': row[4],
+                        'fecha_registro': row[5]
+                    }
+                    empleados.append(empleado)
+                
+            if version == self._version_empleados:
+                self._cache_empleados = {"t": time.monotonic(), "v": empleados}
+            return empleados
             
-            empleados = []
-            for row in cursor.fetchall():
-                empleado = {
-                    'legajo': row[0],
-                    'area': row[1],
-                    'rol': row[2],
-                    'turno': row[3],
-                    'embedding': json.loads(row[4]) if isinstance(row[4], str) else row[4],
-                    'fecha_registro': row[5]
-                }
-                empleados.append(empleado)
+        except Exception as e:
+            logger.error("Error obteniendo empleados: %s", e)
+            return None
+    
+    def obtener_empleados_meta(self):
+        """
+        Obtiene los empleados sin la columna embedding
+        Solo viajan desde la base los campos que se muestran en el listado
+        El resultado se reutiliza durante TTL_CACHE_EMPLEADOS segundos
+        """
+        cache = self._cache_meta
+        if cache["v"] is not None and time.monotonic() - cache["t"] < self.TTL_CACHE_EMPLEADOS:
+            return cache["v"]
+        
+        version = self._version_empleados
+        
+        try:
+            with self._cursor_servidor("empleados_meta") as cursor:
+                cursor.execute("""
+                    SELECT legajo, area, rol, turno, fecha_registro 
+                    FROM empleados 
+                    ORDER BY legajo
+                """)
+                
+                empleados = []
+                for row in cursor:
+                    empleados.append({
+                        'legajo': row[0],
+                        'area': row[1],
+                        'rol': row[2],
+                        'turno': row[3],
+                        'fecha_registro': row[4]
+                    })
             
-            cursor.close()
+            if version == self._version_empleados:
+                self._cache_meta = {"t": time.monotonic(), "v": empleados}
             return empleados
             
         except Exception as e:
-            print(f"ERROR obteniendo empleados: {e}")
+            logger.error("Error obteniendo listado de empleados: %s", e)
             return []
     
+    def obtener_matriz_embeddings(self):
+        """
+        Obtiene los embeddings de todos los empleados como una matriz float32
+        Retorna (legajos, matriz) con una fila por legajo; se arma una vez por llenado del caché
+        Retorna None si no se pudo leer la tabla
+        """
+        empleados = self.obtener_todos_empleados()
+        if empleados is None:
+            return None
+        
+        cache = self._cache_empleados
+        if cache["v"] is empleados and "matriz" in cache:
+            return cache["matriz"]
+        
+        con_embedding = [emp for emp in empleados if emp.get('embedding')]
+        legajos = [emp['legajo'] for emp in con_embedding]
+        
+        if con_embedding:
+            # Matriz reservada de una vez y llenada fila por fila, sin la lista de listas intermedia
+            matriz = np.empty((len(con_embedding), len(con_embedding[0]['embedding'])), dtype=np.float32)
+            for i, emp in enumerate(con_embedding):
+                matriz[i] = emp['embedding']
+        else:
+            matriz = np.empty((0, 0), dtype=np.float32)
+        
+        if cache["v"] is empleados:
+            cache["matriz"] = (legajos, matriz)
+        return legajos, matriz
+    
+    def calentar(self):
+        """
+        Abre una conexión del pool y ejecuta una consulta trivial sobre empleados
+        para que el primer request no pague el handshake ni la lectura de catálogo
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT 1 FROM empleados LIMIT 1")
+                cursor.fetchone()
+        except Exception as e:
+            logger.error("Error precalentando la conexión: %s", e)
+    
     def contar_empleados(self):
+        """
+        Cuenta el número total de empleados
+        Solo en tablas grandes (desde UMBRAL_CONTEO_ESTIMADO filas) usa la
+        estadística del planificador (pg_class.reltuples) en lugar de recorrer
+        la tabla; en las chicas, o si no fue analizada, cuenta exacto
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'empleados'::regclass")
+                row = cursor.fetchone()
+            if row and row[0] >= self.UMBRAL_CONTEO_ESTIMADO:
+                return row[0]
+        except Exception as e:
+            logger.error("Error estimando empleados: %s", e)
+        
+        return self.contar_empleados_exacto()
+    
+    def contar_empleados_exacto(self):
         """Cuenta el número total de empleados"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT COUNT(*) FROM empleados")
-            count = cursor.fetchone()[0]
-            cursor.close()
+            with self._cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM empleados")
+                count = cursor.fetchone()[0]
             return count
         except Exception as e:
-            print(f"ERROR contando empleados: {e}")
+            logger.error("Error contando empleados: %s", e)
             return 0
     
+    def contar_por_turno(self):
+        """Cuenta los empleados de cada turno con una sola consulta agrupada"""
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT turno, COUNT(*) FROM empleados GROUP BY turno")
+                conteos = dict(cursor.fetchall())
+            return conteos
+        except Exception as e:
+            logger.error("Error contando empleados por turno: %s", e)
+            return {}
+    
     def empleado_existe(self, legajo):
         """Verifica si un empleado con el legajo dado ya existe"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT COUNT(*) FROM empleados WHERE legajo = %s", (legajo,))
-            count = cursor.fetchone()[0]
-            cursor.close()
-            return count > 0
+            with self._cursor() as cursor:
+                # Sondeo por la clave primaria: a lo sumo una fila, sin columnas
+                ejecutar_preparada(cursor, "empleado_existe",
+                                   "SELECT 1 FROM empleados WHERE legajo = $1 LIMIT 1", (legajo,))
+                existe = cursor.fetchone() is not None
+            return existe
         except Exception as e:
-            print(f"ERROR verificando empleado: {e}")
+            logger.error("Error verificando empleado: %s", e)
             return False
     
     def registrar_empleado(self, legajo, area, rol, turno, embedding):
-        """Registra un nuevo empleado en la base de datos"""
+        """
+        Registra un nuevo empleado en la base de datos
+        El chequeo de legajo duplicado lo hace el mismo INSERT (ON CONFLICT)
+        Retorna True si se registró, None si el legajo ya existía y False si hubo un error
+        """
         try:
-            cursor = self.connection.cursor()
+            with self._cursor() as cursor:
+                # Convertir embedding a JSON si es una lista o un array de numpy
+                if isinstance(embedding, str):
+                    embedding_json = embedding
+                else:
+                    embedding_json = orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+                
+                if self.pgvector_disponible:
+                    # El texto JSON de la lista es también un literal válido de vector
+                    cursor.execute("""
+                        INSERT INTO empleados (legajo, area, rol, turno, embedding, emb)
+                        VALUES (%s, %s, %s, %s, %s, %s::vector)
+                        ON CONFLICT (legajo) DO NOTHING
+                        RETURNING legajo
+                    """, (legajo, area, rol, turno, embedding_json, embedding_json))
+                else:
+                    cursor.execute("""
+                        INSERT INTO empleados (legajo, area, rol, turno, embedding)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (legajo) DO NOTHING
+                        RETURNING legajo
+                    """, (legajo, area, rol, turno, embedding_json))
+                
+                insertado = cursor.fetchone() is not None
             
-            # Convertir embedding a JSON si es una lista
-            embedding_json = json.dumps(embedding) if isinstance(embedding, list) else embedding
-            
-            cursor.execute("""
-                INSERT INTO empleados (legajo, area, rol, turno, embedding)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (legajo, area, rol, turno, embedding_json))
-            
-            cursor.close()
+            if not insertado:
+                return None
+                
+            self.invalidar_cache_empleados()
             return True
             
         except Exception as e:
-            print(f"ERROR registrando empleado: {e}")
+            logger.error("Error registrando empleado: %s", e)
             return False
     
+    def buscar_mas_cercano(self, embedding):
+        """
+        Busca en PostgreSQL (pgvector) el empleado más cercano al embedding
+        Retorna (legajo, distancia euclidiana entre vectores normalizados) o (None, None)
+        """
+        try:
+            consulta = orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+            
+            with self._cursor() as cursor:
+                ejecutar_preparada(cursor, "buscar_mas_cercano", """
+                    SELECT legajo, emb <=> $1::vector AS distancia_coseno
+                    FROM empleados 
+                    WHERE emb IS NOT NULL
+                    ORDER BY emb <=> $1::vector
+                    LIMIT 1
+                """, (consulta,))
+                
+                row = cursor.fetchone()
+            
+            # Los embeddings nulos dan NaN y quedan al final del orden
+            if row is None or row[1] is None or row[1] != row[1]:
+                return None, None
+            
+            # Entre vectores unitarios: ||a - b||² = 2 · (1 - cos)
+            return row[0], max(0.0, 2.0 * row[1]) ** 0.5
+            
+        except Exception as e:
+            logger.error("Error buscando empleado más cercano: %s", e)
+            return None, None
+    
     def obtener_empleado(self, legajo):
         """Obtiene un empleado específico por legajo"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT legajo, area, rol, turno, embedding, fecha_registro 
-                FROM empleados 
-                WHERE legajo = %s
-            """, (legajo,))
-            
-            row = cursor.fetchone()
-            cursor.close()
+            with self._cursor() as cursor:
+                ejecutar_preparada(cursor, "obtener_empleado", """
+                    SELECT legajo, area, rol, turno, embedding, fecha_registro 
+                    FROM empleados 
+                    WHERE legajo = $1
+                """, (legajo,))
+                
+                row = cursor.fetchone()
             
             if row:
                 return {
@@ -155,34 +503,37 @@ class DatabaseManager:
                     'area': row[1],
                     'rol': row[2],
                     'turno': row[3],
-                    'embedding': json.loads(row[4]) if isinstance(row[4], str) else row[4],
+                    'embedding': row[4],
                     'fecha_registro': row[5]
                 }
             return None
             
         except Exception as e:
-            print(f"ERROR obteniendo empleado: {e}")
+            logger.error("Error obteniendo empleado: %s", e)
             return None
     
     def eliminar_empleado(self, legajo):
         """Elimina un empleado de la base de datos"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("DELETE FROM empleados WHERE legajo = %s", (legajo,))
-            cursor.close()
+            with self._cursor() as cursor:
+                cursor.execute("DELETE FROM empleados WHERE legajo = %s", (legajo,))
+            self.invalidar_cache_empleados()
             return True
         except Exception as e:
-            print(f"ERROR eliminando empleado: {e}")
+            logger.error("Error eliminando empleado: %s", e)
             return False
     
+    def invalidar_cache_empleados(self):
+        """Descarta el listado cacheado para que la próxima lectura vaya a la base"""
+        self._version_empleados += 1
+        self._cache_empleados = {"t": 0.0, "v": None}
+        self._cache_meta = {"t": 0.0, "v": None}
+    
     def cerrar_conexion(self):
-        """Cierra la conexión con la base de datos"""
+        """Cierra todas las conexiones del pool"""
         try:
-            if self.connection:
-                self.connection.close()
+            pool = getattr(self, 'pool', None)
+            if pool and not pool.closed:
+                pool.closeall()
         except Exception as e:
-            print(f"ERROR cerrando conexión: {e}")
-    
-    def __del__(self):
-        """Destructor para cerrar automáticamente la conexión"""
-        self.cerrar_conexion()
+            logger.error("Error cerrando conexión: %s", e)
@@ -1,154 +1,209 @@
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from persistencia.databaseManager import ConexionPreparada, ejecutar_preparada
+from contextlib import contextmanager
 import os
+import atexit
+import logging
 from datetime import datetime, date, time
 
+logger = logging.getLogger(__name__)
+
 class RegistrarAsistencias:
-    def __init__(self):
-        """Inicializa la conexión con la base de datos PostgreSQL"""
+    # Tamaño del pool propio, si no se comparte el de DatabaseManager
+    MIN_CONEXIONES = 1
+    MAX_CONEXIONES = 10
+    
+    def __init__(self, pool=None):
+        """
+        Inicializa la conexión con la base de datos PostgreSQL
+        
+        Args:
+            pool (ThreadedConnectionPool, optional): Pool ya abierto para compartir
+                (por ejemplo el de DatabaseManager); si no se pasa se crea uno propio
+        """
         try:
             # Obtener URL de conexión desde variable de entorno
             self.database_url = os.environ.get('DATABASE_URL')
             if not self.database_url:
                 raise Exception("DATABASE_URL no encontrada en variables de entorno")
             
-            # Establecer conexión
-            self.connection = psycopg2.connect(self.database_url)
-            self.connection.autocommit = True
+            # Pool de conexiones: los requests concurrentes no se serializan en
+            # una única conexión y una conexión caída no deja afuera a la app
+            self._pool_propio = pool is None
+            self.pool = pool or ThreadedConnectionPool(
+                self.MIN_CONEXIONES, self.MAX_CONEXIONES, self.database_url,
+                connection_factory=ConexionPreparada
+            )
+            if self._pool_propio:
+                atexit.register(self.cerrar_conexion)
             
         except Exception as e:
-            print(f"ERROR conectando a PostgreSQL en RegistrarAsistencias: {e}")
+            logger.error("Error conectando a PostgreSQL en RegistrarAsistencias: %s", e)
             raise e
     
+    @contextmanager
+    def _cursor(self):
+        """Presta una conexión del pool (en autocommit) y devuelve un cursor sobre ella"""
+        connection = self.pool.getconn()
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                yield cursor
+        finally:
+            # Una conexión caída se descarta en lugar de volver al pool
+            self.pool.putconn(connection, close=bool(connection.closed))
+    
+    def cerrar_conexion(self):
+        """Cierra las conexiones del pool, solo si es propio"""
+        try:
+            if self._pool_propio and not self.pool.closed:
+                self.pool.closeall()
+        except Exception as e:
+            logger.error("Error cerrando conexión de asistencias: %s", e)
+    
     def registrar(self, legajo, turno):
         """
         Registra una asistencia (entrada o salida) para un empleado
         Determina automáticamente si es entrada o salida basado en el último registro
         """
         try:
-            cursor = self.connection.cursor()
-            
             # Obtener la fecha y hora actual
             ahora = datetime.now()
             fecha_hoy = ahora.date()
             hora_actual = ahora.time()
             
-            # Verificar el último registro del empleado para hoy
-            cursor.execute("""
-                SELECT tipo FROM asistencias 
-                WHERE legajo = %s AND fecha = %s 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-            """, (legajo, fecha_hoy))
-            
-            ultimo_registro = cursor.fetchone()
-            
-            # Determinar tipo de registro (entrada o salida)
-            if ultimo_registro is None or ultimo_registro[0] == 'salida':
-                tipo = 'entrada'
-            else:
-                tipo = 'salida'
-            
-            # Insertar el registro de asistencia
-            cursor.execute("""
-                INSERT INTO asistencias (legajo, turno, tipo, fecha, hora)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (legajo, turno, tipo, fecha_hoy, hora_actual))
-            
-            cursor.close()
-            
-            print(f"INFO: Asistencia registrada - {legajo} - {tipo} - {turno}")
+            with self._cursor() as cursor:
+                # Una sola sentencia: el último registro de hoy decide el tipo
+                # (sin registro o tras una salida es entrada; tras una entrada, salida)
+                ejecutar_preparada(cursor, "registrar_asistencia", """
+                    WITH ultimo AS (
+                        SELECT tipo FROM asistencias 
+                        WHERE legajo = $1 AND fecha = $3 
+                        ORDER BY timestamp DESC 
+                        LIMIT 1
+                    )
+                    INSERT INTO asistencias (legajo, turno, tipo, fecha, hora)
+                    SELECT $1, $2::varchar,
+                           CASE WHEN (SELECT tipo FROM ultimo) = 'entrada' THEN 'salida' ELSE 'entrada' END,
+                           $3, $4::time
+                    RETURNING tipo
+                """, (legajo, turno, fecha_hoy, hora_actual))
+                
+                tipo = cursor.fetchone()[0]
+            
+            logger.info("Asistencia registrada - %s - %s - %s", legajo, tipo, turno)
             return True
             
         except Exception as e:
-            print(f"ERROR registrando asistencia: {e}")
+            logger.error("Error registrando asistencia: %s", e)
             return False
     
     def obtener_asistencias_empleado(self, legajo):
         """Obtiene todas las asistencias de un empleado específico"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT legajo, turno, tipo, fecha, hora, timestamp
-                FROM asistencias 
-                WHERE legajo = %s 
-                ORDER BY timestamp DESC
-            """, (legajo,))
-            
-            asistencias = []
-            for row in cursor.fetchall():
-                asistencia = {
-                    'legajo': row[0],
-                    'turno': row[1],
-                    'tipo': row[2],
-                    'fecha': row[3].strftime('%Y-%m-%d') if row[3] else None,
-                    'hora': row[4].strftime('%H:%M:%S') if row[4] else None,
-                    'timestamp': row[5].isoformat() if row[5] else None
-                }
-                asistencias.append(asistencia)
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT legajo, turno, tipo, fecha, hora, timestamp
+                    FROM asistencias 
+                    WHERE legajo = %s 
+                    ORDER BY timestamp DESC
+                """, (legajo,))
+                
+                asistencias = []
+                for row in cursor.fetchall():
+                    asistencia = {
+                        'legajo': row[0],
+                        'turno': row[1],
+                        'tipo': row[2],
+                        'fecha': row[3],
+                        'hora': row[4].strftime('%H:%M:%S') if row[4] else None,
+                        'timestamp': row[5]
+                    }
+                    asistencias.append(asistencia)
             
-            cursor.close()
             return asistencias
             
         except Exception as e:
-            print(f"ERROR obteniendo asistencias: {e}")
+            logger.error("Error obteniendo asistencias: %s", e)
             return []
     
     def obtener_asistencias_fecha(self, fecha):
         """Obtiene todas las asistencias de una fecha específica"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT legajo, turno, tipo, fecha, hora, timestamp
-                FROM asistencias 
-                WHERE fecha = %s 
-                ORDER BY timestamp
-            """, (fecha,))
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT legajo, turno, tipo, fecha, hora, timestamp
+                    FROM asistencias 
+                    WHERE fecha = %s 
+                    ORDER BY timestamp
+                """, (fecha,))
+                
+                asistencias = []
+                for row in cursor.fetchall():
+                    asistencia = {
+                        'legajo': row[0],
+                        'turno': row[1],
+                        'tipo': row[2],
+                        'fecha': row[3],
+                        'hora': row[4].strftime('%H:%M:%S') if row[4] else None,
+                        'timestamp': row[5]
+                    }
+                    asistencias.append(asistencia)
             
-            asistencias = []
-            for row in cursor.fetchall():
-                asistencia = {
-                    'legajo': row[0],
-                    'turno': row[1],
-                    'tipo': row[2],
-                    'fecha': row[3].strftime('%Y-%m-%d') if row[3] else None,
-                    'hora': row[4].strftime('%H:%M:%S') if row[4] else None,
-                    'timestamp': row[5].isoformat() if row[5] else None
-                }
-                asistencias.append(asistencia)
-            
-            cursor.close()
             return asistencias
             
         except Exception as e:
-            print(f"ERROR obteniendo asistencias por fecha: {e}")
+            logger.error("Error obteniendo asistencias por fecha: %s", e)
             return []
     
+    def contar_asistencias_por_dia(self, desde):
+        """
+        Cuenta cuántos empleados registraron entrada en cada día desde la fecha dada
+        Retorna un diccionario {fecha: cantidad} solo con los días que tienen registros
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT fecha, COUNT(DISTINCT legajo)
+                    FROM asistencias 
+                    WHERE fecha >= %s AND tipo = 'entrada'
+                    GROUP BY fecha
+                """, (desde,))
+                
+                conteos = {row[0]: row[1] for row in cursor.fetchall()}
+            
+            return conteos
+            
+        except Exception as e:
+            logger.error("Error contando asistencias por día: %s", e)
+            return {}
+    
     def obtener_ultimo_registro(self, legajo):
         """Obtiene el último registro de asistencia de un empleado"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT legajo, turno, tipo, fecha, hora, timestamp
-                FROM asistencias 
-                WHERE legajo = %s 
-                ORDER BY timestamp DESC
-                LIMIT 1
-            """, (legajo,))
-            
-            row = cursor.fetchone()
-            cursor.close()
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT legajo, turno, tipo, fecha, hora, timestamp
+                    FROM asistencias 
+                    WHERE legajo = %s 
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                """, (legajo,))
+                
+                row = cursor.fetchone()
             
             if row:
                 return {
                     'legajo': row[0],
                     'turno': row[1],
                     'tipo': row[2],
-                    'fecha': row[3].strftime('%Y-%m-%d') if row[3] else None,
+                    'fecha': row[3],
                     'hora': row[4].strftime('%H:%M:%S') if row[4] else None,
-                    'timestamp': row[5].isoformat() if row[5] else None
+                    'timestamp': row[5]
                 }
             return None
             
         except Exception as e:
-            print(f"ERROR obteniendo último registro: {e}")
+            logger.error("Error obteniendo último registro: %s", e)
             return None
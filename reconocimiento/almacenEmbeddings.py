@@ -0,0 +1,236 @@
+import io
+import orjson
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_EMBEDDING = 128
+
+class AlmacenEmbeddings:
+    def __init__(self, directorio="data"):
+        """
+        Inicializa el almacén de embeddings
+
+        Los embeddings se guardan como una única matriz float32 de forma (N, D)
+        en embeddings.npy, y los datos de cada empleado (fila, área, rol, turno)
+        en meta.json, que nunca contiene floats.
+
+        Args:
+            directorio (str): Carpeta donde viven los archivos
+        """
+        self.ruta_matriz = os.path.normpath(os.path.join(directorio, "embeddings.npy"))
+        self.ruta_meta = os.path.normpath(os.path.join(directorio, "meta.json"))
+        self.ruta_json = os.path.normpath(os.path.join(directorio, "embeddings.json"))
+
+    def ultima_modificacion(self):
+        """
+        Devuelve el st_mtime_ns de meta.json (se escribe último al guardar)
+
+        Returns:
+            int or None: Marca de modificación o None si no existe
+        """
+        try:
+            return os.stat(self.ruta_meta).st_mtime_ns
+        except OSError:
+            return None
+
+    def cargar(self):
+        """
+        Carga la metadata y la matriz de embeddings
+
+        Si todavía no existe el formato nuevo pero sí el embeddings.json
+        anterior, lo migra una única vez.
+
+        Returns:
+            tuple: (meta, matriz) donde meta es {"legajos": {legajo: {...}}}
+        """
+        if os.path.exists(self.ruta_meta) and os.path.exists(self.ruta_matriz):
+            with open(self.ruta_meta, "rb") as f:
+                meta = orjson.loads(f.read())
+            matriz = np.load(self.ruta_matriz)
+            return meta, matriz
+
+        if os.path.exists(self.ruta_json):
+            return self._migrar_json()
+
+        return {"legajos": {}}, np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+
+    def cargar_meta(self):
+        """Carga solo la metadata, sin tocar los bytes de los embeddings"""
+        if os.path.exists(self.ruta_meta):
+            with open(self.ruta_meta, "rb") as f:
+                return orjson.loads(f.read())
+        return self.cargar()[0]
+
+    def agregar(self, legajo, embedding, area="", rol="", turno=""):
+        """
+        Agrega (o reemplaza) el embedding de un empleado
+
+        Un legajo nuevo se anexa al final de embeddings.npy sin reescribir la
+        matriz; solo reemplazar un embedding existente reescribe el archivo.
+
+        Args:
+            legajo (str): Legajo o identificador del empleado
+            embedding (list or np.ndarray): Vector de características
+            area (str): Área del empleado
+            rol (str): Rol del empleado
+            turno (str): Turno asignado
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        legajo_str = str(legajo).strip()
+        datos = {"area": area, "rol": rol, "turno": turno}
+
+        if os.path.exists(self.ruta_meta) and os.path.exists(self.ruta_matriz):
+            meta = self.cargar_meta()
+            if legajo_str not in meta["legajos"]:
+                fila = self._anexar_fila(vector[0])
+                if fila is not None:
+                    meta["legajos"][legajo_str] = {"fila": fila, **datos}
+                    self._guardar_meta(meta)
+                    return
+
+        meta, matriz = self.cargar()
+
+        if matriz.shape[0] == 0:
+            matriz = np.empty((0, vector.shape[1]), dtype=np.float32)
+
+        existente = meta["legajos"].get(legajo_str)
+
+        if existente is not None:
+            fila = existente["fila"]
+            matriz = np.array(matriz, dtype=np.float32)
+            matriz[fila] = vector[0]
+        else:
+            fila = matriz.shape[0]
+            matriz = np.concatenate([matriz, vector])
+
+        meta["legajos"][legajo_str] = {"fila": fila, **datos}
+
+        self._guardar(meta, matriz)
+
+    def _anexar_fila(self, vector):
+        """
+        Escribe una fila al final de embeddings.npy y actualiza su encabezado
+
+        np.save deja espacio libre en el encabezado para que la cantidad de
+        filas crezca sin moverlo; si no alcanza, o el archivo no es una matriz
+        float32 compatible, no se toca nada.
+
+        Args:
+            vector (np.ndarray): Embedding float32 de una dimensión
+
+        Returns:
+            int or None: Índice de la fila escrita, o None si hay que reescribir la matriz
+        """
+        formato = np.lib.format
+        try:
+            with open(self.ruta_matriz, "r+b") as f:
+                if formato.read_magic(f) != (1, 0):
+                    return None
+                forma, fortran, dtype = formato.read_array_header_1_0(f)
+                inicio_datos = f.tell()
+
+                if fortran or dtype != np.float32 or len(forma) != 2 or forma[1] != vector.size:
+                    return None
+
+                fila = forma[0]
+                encabezado = io.BytesIO()
+                formato.write_array_header_1_0(encabezado, {
+                    "descr": formato.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (fila + 1, forma[1])
+                })
+                if len(encabezado.getvalue()) != inicio_datos:
+                    return None
+
+                # Primero los datos y después el encabezado: un lector concurrente
+                # ve la matriz anterior o la nueva completa
+                f.seek(inicio_datos + fila * dtype.itemsize * forma[1])
+                f.write(vector.astype(dtype).tobytes())
+                f.truncate()
+                f.flush()
+                f.seek(0)
+                f.write(encabezado.getvalue())
+            return fila
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo anexar a {self.ruta_matriz}, se reescribe: {e}")
+            return None
+
+    def _guardar(self, meta, matriz):
+        """Escribe matriz y metadata de forma atómica (tmp + rename)"""
+        directorio = os.path.dirname(self.ruta_matriz)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        tmp_matriz = self.ruta_matriz + ".tmp"
+        with open(tmp_matriz, "wb") as f:
+            np.save(f, np.ascontiguousarray(matriz, dtype=np.float32))
+        os.replace(tmp_matriz, self.ruta_matriz)
+
+        # La metadata se escribe al final: es la que marca la versión
+        self._guardar_meta(meta)
+
+    def _guardar_meta(self, meta):
+        """Escribe meta.json de forma atómica (tmp + rename)"""
+        tmp_meta = self.ruta_meta + ".tmp"
+        with open(tmp_meta, "wb") as f:
+            f.write(orjson.dumps(meta))
+        os.replace(tmp_meta, self.ruta_meta)
+
+    def _migrar_json(self):
+        """Convierte el embeddings.json anterior al formato matriz + meta"""
+        try:
+            with open(self.ruta_json, "rb") as f:
+                contenido = f.read().strip()
+                data = orjson.loads(contenido) if contenido else {}
+        except orjson.JSONDecodeError:
+            logger.error("Error al decodificar JSON de embeddings, se inicia vacío")
+            data = {}
+
+        meta, matriz = self.guardar_todos(data)
+        logger.info(f"Migrados {len(meta['legajos'])} embeddings desde {self.ruta_json}")
+
+        return meta, matriz
+
+    def guardar_todos(self, data):
+        """
+        Reemplaza el almacén completo a partir de un diccionario por legajo
+
+        Args:
+            data (dict): legajo -> {"embedding": [...], "area", "rol", "turno"}
+                         o legajo -> lista del embedding
+
+        Returns:
+            tuple: (meta, matriz) tal como quedaron guardados
+        """
+        if not isinstance(data, dict):
+            data = {}
+
+        meta = {"legajos": {}}
+        filas = []
+
+        for legajo, datos in data.items():
+            # registrar_empleado.py guardaba la lista directamente
+            if isinstance(datos, list):
+                datos = {"embedding": datos}
+
+            if not isinstance(datos, dict) or datos.get("embedding") is None or len(datos["embedding"]) == 0:
+                continue
+
+            meta["legajos"][str(legajo)] = {
+                "fila": len(filas),
+                "area": datos.get("area", ""),
+                "rol": datos.get("rol", ""),
+                "turno": datos.get("turno", "")
+            }
+            filas.append(datos["embedding"])
+
+        if filas:
+            matriz = np.asarray(filas, dtype=np.float32)
+        else:
+            matriz = np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+
+        self._guardar(meta, matriz)
+        return meta, matriz
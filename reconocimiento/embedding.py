@@ -1,38 +1,124 @@
+import cv2
 import face_recognition
-import json
 import numpy as np
 import os
+from functools import lru_cache
+from reconocimiento.almacenEmbeddings import AlmacenEmbeddings
+
+def _primer_encoding(imagen_rgb, num_jitters=1, modelo="large"):
+    encodings = face_recognition.face_encodings(imagen_rgb, num_jitters=num_jitters, model=modelo)
+    if not encodings:
+        raise ValueError("No se pudo generar embedding para la cara recortada")
+    return encodings[0]
+
+# Clave (ruta, mtime, tamaño): volver a pasar el mismo archivo sin cambios no
+# repite la decodificación ni la red de dlib
+@lru_cache(maxsize=64)
+def _encoding_de_archivo(ruta, mtime_ns, tamanio, num_jitters, modelo):
+    return tuple(_primer_encoding(_leer_rgb(ruta), num_jitters, modelo).tolist())
+
+def _leer_rgb(imagen):
+    if not isinstance(imagen, (str, os.PathLike)):
+        return imagen
+    ruta = os.fspath(imagen)
+    bgr = cv2.imread(ruta)
+    if bgr is None:
+        raise ValueError(f"No se pudo leer la imagen {ruta}")
+    # OpenCV decodifica el JPEG más rápido que PIL; face_recognition espera RGB
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
 
 class EmbeddingManager:
-    def __init__(self, ruta_json="data/embeddings.json"):
+    def __init__(self, ruta_json="data/embeddings.json", num_jitters=1, modelo="large"):
+        # Los embeddings viven en el AlmacenEmbeddings de la carpeta de ruta_json
+        # (embeddings.npy + meta.json, el mismo que usan registrar_empleado.py y
+        # VerificadorFacial); un embeddings.json viejo se migra al primer uso
         self.ruta = os.path.normpath(ruta_json)
+        self.almacen = AlmacenEmbeddings(os.path.dirname(self.ruta) or ".")
+        # Cada jitter es otra pasada completa de la ResNet; "small" usa 5 landmarks
+        # para alinear y es más rápido, pero sus encodings no son idénticos a los
+        # de "large": conviene no mezclar modelos sobre la misma base
+        self.num_jitters = num_jitters
+        self.modelo = modelo
+        # Última lectura del almacén: (marca de modificación, contenido)
+        self._cache = (None, {})
+        # Matriz armada a partir de esa lectura: (clave, legajos, E, ||e||²)
+        self._matriz = (None, [], None, None)
 
     def generar_embedding(self, face_img):
-        encodings = face_recognition.face_encodings(face_img)
-        if not encodings:
-            raise ValueError("No se pudo generar embedding para la cara recortada")
-        return encodings[0].tolist()
+        # Acepta la imagen ya cargada (RGB) o la ruta de un archivo
+        if isinstance(face_img, (str, os.PathLike)):
+            ruta = os.fspath(face_img)
+            st = os.stat(ruta)
+            return list(_encoding_de_archivo(ruta, st.st_mtime_ns, st.st_size, self.num_jitters, self.modelo))
+        return _primer_encoding(face_img, self.num_jitters, self.modelo).tolist()
 
     def cargar_embeddings(self):
-        if not os.path.exists(self.ruta):
-            return {}
+        # Mientras el almacén no cambie se reutiliza lo ya leído; se devuelve
+        # una copia de cada empleado para que quien modifique el resultado no
+        # altere el caché (las listas de embedding no se copian: solo se leen)
+        clave = self.almacen.ultima_modificacion()
+        if clave is not None and self._cache[0] == clave:
+            return {legajo: dict(datos) for legajo, datos in self._cache[1].items()}
 
-        with open(self.ruta, "r") as f:
-            contenido = f.read().strip()
-            if not contenido:
-                return {}
+        meta, matriz = self.almacen.cargar()
+        data = {
+            legajo: {
+                "embedding": matriz[datos["fila"]].tolist(),
+                "area": datos.get("area", ""),
+                "rol": datos.get("rol", ""),
+                "turno": datos.get("turno", "")
+            }
+            for legajo, datos in meta["legajos"].items()
+        }
 
-            try:
-                return json.loads(contenido)
-            except json.JSONDecodeError:
-                return {}
+        self._cache = (clave, data)
+        return {legajo: dict(datos) for legajo, datos in data.items()}
 
     def guardar_embeddings(self, data):
-        with open(self.ruta, "w") as f:
-            json.dump(data, f, indent=2)
+        # Reemplaza el almacén completo; acepta listas o ndarray como embedding
+        self.almacen.guardar_todos(data)
+
+    def _obtener_matriz(self):
+        clave = self.almacen.ultima_modificacion()
+        if self._matriz[0] == clave and clave is not None:
+            return self._matriz[1:]
+
+        # La matriz sale tal cual del almacén: no se arma desde listas
+        meta, matriz = self.almacen.cargar()
+
+        legajos = [None] * matriz.shape[0]
+        for legajo, datos in meta["legajos"].items():
+            legajos[datos["fila"]] = legajo
+
+        # Las filas sin legajo en la metadata (altas interrumpidas) no pueden
+        # ser el más cercano: su norma queda en infinito
+        huerfanas = [fila for fila, legajo in enumerate(legajos) if legajo is None]
+        if len(huerfanas) < len(legajos):
+            normas = np.einsum('ij,ij->i', matriz, matriz)
+            normas[huerfanas] = np.inf
+        else:
+            matriz = normas = None
+
+        self._matriz = (clave, legajos, matriz, normas)
+        return legajos, matriz, normas
+
+    def buscar_mas_cercano(self, query, threshold=0.6):
+        # Todas las distancias en un solo producto matriz-vector:
+        # ||e - q||² = ||e||² + ||q||² - 2·e·q
+        legajos, matriz, normas = self._obtener_matriz()
+        if matriz is None:
+            return None, None
+
+        q = np.asarray(query, dtype=np.float32)
+        distancias2 = normas + q @ q - 2.0 * (matriz @ q)
+        idx = int(distancias2.argmin())
+        distancia = float(np.sqrt(max(0.0, float(distancias2[idx]))))
+
+        if distancia < threshold:
+            return legajos[idx], distancia
+        return None, distancia
 
     def comparar_embeddings(self, emb1, emb2, threshold=0.6):
-        v1 = np.array(emb1)
-        v2 = np.array(emb2)
-        distancia = np.linalg.norm(v1 - v2)
-        return distancia < threshold
+        diferencia = np.asarray(emb1, dtype=np.float32) - np.asarray(emb2, dtype=np.float32)
+        # Solo importa el umbral: se compara la distancia al cuadrado y se evita la raíz
+        return diferencia @ diferencia < threshold * threshold
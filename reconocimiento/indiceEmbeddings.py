@@ -0,0 +1,135 @@
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class IndiceEmbeddings:
+    def __init__(self):
+        """
+        Inicializa el índice de embeddings
+
+        Guarda todos los embeddings como una matriz float32 contigua con filas
+        L2-normalizadas, de modo que comparar una cara contra N empleados es
+        una sola multiplicación matriz-vector.
+
+        El estado (legajos, matriz) se publica como una única tupla que nunca se
+        modifica en el lugar: las búsquedas la toman sin lock y siempre ven un
+        par consistente. Solo las escrituras se serializan.
+
+        La matriz publicada es una vista de las primeras filas de _buffer, que
+        crece al doble cuando se llena: agregar un empleado escribe una fila
+        libre en lugar de copiar la matriz entera.
+        """
+        self._datos = ([], np.empty((0, 0), dtype=np.float32))
+        self._buffer = self._datos[1]
+        self._posiciones = {}
+        self._lock_escritura = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos[0])
+
+    @property
+    def legajos(self):
+        return self._datos[0]
+
+    @property
+    def matriz(self):
+        return self._datos[1]
+
+    def construir_desde_matriz(self, legajos, matriz):
+        """
+        Reconstruye el índice a partir de una matriz de embeddings ya armada
+
+        Args:
+            legajos (list): Legajo de cada fila
+            matriz (np.ndarray): Embeddings de forma (N, D); no se modifica
+        """
+        legajos = list(legajos)
+
+        if len(legajos) > 0:
+            matriz = np.asarray(matriz, dtype=np.float32)
+            normas = np.linalg.norm(matriz, axis=1)
+
+            # Los embeddings nulos (registro sin reconocimiento) no pueden coincidir
+            validas = normas > 0
+            matriz = np.ascontiguousarray(matriz[validas] / normas[validas, None])
+            legajos = [legajo for legajo, valida in zip(legajos, validas) if valida]
+        else:
+            matriz = np.empty((0, 0), dtype=np.float32)
+
+        with self._lock_escritura:
+            self._posiciones = {legajo: i for i, legajo in enumerate(legajos)}
+            self._buffer = matriz
+            self._datos = (legajos, matriz)
+        logger.info(f"Índice de embeddings construido con {len(legajos)} empleados")
+
+    def agregar(self, legajo, embedding):
+        """
+        Agrega (o reemplaza) un empleado sin reconstruir el índice completo
+
+        Args:
+            legajo (str): Legajo del empleado
+            embedding (list or np.ndarray): Embedding del empleado
+        """
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norma = np.linalg.norm(vector)
+        if vector.size == 0 or norma == 0:
+            return
+
+        fila = (vector / norma)[None, :]
+
+        with self._lock_escritura:
+            legajos, matriz = self._datos
+            cantidad = len(legajos)
+            posicion = self._posiciones.get(legajo)
+
+            if posicion is not None:
+                # Las búsquedas en curso pueden estar leyendo esa fila: copiar
+                self._buffer = self._buffer.copy()
+                self._buffer[posicion] = fila[0]
+            else:
+                if self._buffer.shape[0] == cantidad or self._buffer.shape[1] != fila.shape[1]:
+                    buffer = np.empty((max(64, 2 * cantidad), fila.shape[1]), dtype=np.float32)
+                    if cantidad:
+                        buffer[:cantidad] = matriz
+                    self._buffer = buffer
+
+                # La fila libre queda fuera de las vistas ya publicadas
+                self._buffer[cantidad] = fila[0]
+                self._posiciones[legajo] = cantidad
+                legajos = legajos + [legajo]
+                cantidad += 1
+
+            matriz = self._buffer[:cantidad]
+
+            # Una sola asignación: las búsquedas ven el par viejo o el nuevo
+            self._datos = (legajos, matriz)
+        logger.info(f"Empleado {legajo} agregado al índice de embeddings")
+
+    def buscar(self, embedding):
+        """
+        Busca el empleado más cercano al embedding dado
+
+        Args:
+            embedding (list or np.ndarray): Embedding de la cara a identificar
+
+        Returns:
+            tuple: (legajo, distancia euclidiana) o (None, None) si no hay datos
+        """
+        legajos, matriz = self._datos
+        if not legajos:
+            return None, None
+
+        consulta = np.asarray(embedding, dtype=np.float32)
+        norma = np.linalg.norm(consulta)
+        if norma == 0:
+            return None, None
+
+        similitudes = matriz @ (consulta / norma)
+        idx = int(similitudes.argmax())
+
+        # Entre vectores unitarios: ||a - b||² = 2 - 2·cos
+        distancia = float(np.sqrt(max(0.0, 2.0 - 2.0 * float(similitudes[idx]))))
+
+        return legajos[idx], distancia
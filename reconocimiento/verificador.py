@@ -1,51 +1,170 @@
 # reconocimiento/verificador.py
 import cv2
-import numpy as np
-import face_recognition
-import json
+import math
 import os
+import numpy as np
+import threading
 import logging
+from reconocimiento.almacenEmbeddings import AlmacenEmbeddings, DIMENSION_EMBEDDING
 
 logger = logging.getLogger(__name__)
 
+# face_recognition (y dlib) se importa en el primer uso: inicializa BLAS/CUDA y
+# no hace falta para validar legajos o cargar embeddings
+_face_recognition = None
+
+def _fr():
+    """Devuelve el módulo face_recognition, importándolo la primera vez"""
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
+# La detección HOG corre sobre una copia de este ancho: su costo escala con los píxeles
+ANCHO_DETECCION = 320
+
 class VerificadorFacial:
-    def __init__(self, ruta_embeddings="data/embeddings.json", umbral_distancia=0.6):
+    def __init__(self, directorio_embeddings="data", umbral_distancia=0.6, usar_cnn=False,
+                 num_jitters=1, modelo_landmarks="large", ruta_embeddings=None):
         """
         Inicializa el verificador facial
         
         Args:
-            ruta_embeddings (str): Ruta del archivo de embeddings
+            directorio_embeddings (str): Carpeta con embeddings.npy y meta.json
             umbral_distancia (float): Umbral para considerar una coincidencia
+            usar_cnn (bool): Detectar con el modelo CNN de dlib; solo se usa si
+                             dlib fue compilado con CUDA, si no se sigue con HOG
+            num_jitters (int): Pasadas de la red por cara; cada una suma una
+                               inferencia completa
+            modelo_landmarks (str): "large" (68 puntos) o "small" (5 puntos, más
+                                    rápido); debe coincidir con el usado al registrar
+            ruta_embeddings (str, optional): Nombre anterior del parámetro (ruta del
+                                             embeddings.json); se usa su carpeta
         """
-        self.ruta_embeddings = ruta_embeddings
+        if ruta_embeddings is not None:
+            directorio_embeddings = ruta_embeddings
+        
+        # Compatibilidad con quienes pasan la ruta del embeddings.json anterior:
+        # el almacén vive en la misma carpeta y lo migra al primer uso
+        if os.fspath(directorio_embeddings).endswith(".json"):
+            directorio_embeddings = os.path.dirname(os.fspath(directorio_embeddings)) or "."
+        
+        self.almacen = AlmacenEmbeddings(directorio_embeddings)
+        self.ruta_embeddings = self.almacen.ruta_json
         self.umbral_distancia = umbral_distancia
-        self.base_empleados = self._cargar_embeddings()
+        self.num_jitters = num_jitters
+        self.modelo_landmarks = modelo_landmarks
+        self.modelo_deteccion = self._elegir_modelo_deteccion(usar_cnn)
+        self._lock = threading.Lock()
+        self._mtime_embeddings = None
+        
+        # (base_empleados, matriz, mitad_normas, legajos_por_fila, areas_por_fila,
+        # roles_por_fila, turnos_por_fila) se publica como
+        # una única tupla que nunca se modifica en el lugar: las búsquedas la
+        # toman sin lock y siempre ven un estado consistente
+        self._datos = self._cargar_embeddings()
         
         logger.info(f"VerificadorFacial inicializado con {len(self.base_empleados)} empleados")
         logger.info(f"Umbral de distancia: {umbral_distancia}")
+        logger.info(f"Modelo de detección: {self.modelo_deteccion}")
+    
+    def _elegir_modelo_deteccion(self, usar_cnn):
+        """Devuelve "cnn" si se pidió y hay CUDA disponible, si no "hog" """
+        if not usar_cnn:
+            return "hog"
+        
+        import dlib
+        if not getattr(dlib, "DLIB_USE_CUDA", False):
+            logger.warning("dlib sin soporte CUDA, se usa el detector HOG")
+            return "hog"
+        
+        # La primera inferencia crea el contexto CUDA (~1-2 s): se paga acá y
+        # no en la primera verificación
+        _fr().face_locations(np.zeros((64, 64, 3), dtype=np.uint8), model="cnn")
+        return "cnn"
+    
+    @property
+    def base_empleados(self):
+        return self._datos[0]
+    
+    @property
+    def matriz_embeddings(self):
+        return self._datos[1]
+    
+    @property
+    def mitad_normas(self):
+        return self._datos[2]
+    
+    @property
+    def legajos_por_fila(self):
+        return self._datos[3]
+    
+    @staticmethod
+    def _empleado_de_fila(datos, fila):
+        """Arma los datos públicos del empleado de una fila a partir de las listas por fila"""
+        return {
+            "legajo": datos[3][fila],
+            "area": datos[4][fila],
+            "rol": datos[5][fila],
+            "turno": datos[6][fila]
+        }
     
     def _cargar_embeddings(self):
-        """Carga los embeddings desde el archivo"""
-        if not os.path.exists(self.ruta_embeddings):
-            logger.warning(f"Archivo de embeddings no encontrado: {self.ruta_embeddings}")
-            return {}
+        """
+        Carga la metadata y la matriz de embeddings desde el almacén
         
+        Returns:
+            tuple: (base_empleados, matriz, mitad_normas, legajos_por_fila,
+                    areas_por_fila, roles_por_fila, turnos_por_fila)
+        """
         try:
-            with open(self.ruta_embeddings, "r") as f:
-                data = json.load(f)
-                logger.info(f"Embeddings cargados: {len(data)} empleados")
-                return data
-        except json.JSONDecodeError:
-            logger.error("Error al decodificar JSON de embeddings")
-            return {}
+            # La marca se toma antes de leer: si el almacén cambia en el medio,
+            # la próxima recarga lo vuelve a leer
+            mtime = self.almacen.ultima_modificacion()
+            meta, matriz = self.almacen.cargar()
+            
+            # Legajo y datos de cada fila de la matriz en listas paralelas: una
+            # búsqueda resuelve su argmin indexando, sin consultar diccionarios
+            cantidad = matriz.shape[0]
+            legajos_por_fila = [None] * cantidad
+            areas_por_fila = [""] * cantidad
+            roles_por_fila = [""] * cantidad
+            turnos_por_fila = [""] * cantidad
+            for legajo, datos in meta["legajos"].items():
+                fila = datos["fila"]
+                legajos_por_fila[fila] = legajo
+                areas_por_fila[fila] = datos.get("area", "")
+                roles_por_fila[fila] = datos.get("rol", "")
+                turnos_por_fila[fila] = datos.get("turno", "")
+            
+            # ½·||e||² de cada fila, fijo mientras no cambie la matriz
+            mitad_normas = 0.5 * np.einsum('ij,ij->i', matriz, matriz)
+            # Las filas sin legajo en la metadata (altas interrumpidas) quedan
+            # en infinito para que nunca ganen el argmin
+            huerfanas = [fila for fila, legajo in enumerate(legajos_por_fila) if legajo is None]
+            if huerfanas:
+                mitad_normas[huerfanas] = np.inf
+            self._mtime_embeddings = mtime
+            logger.info(f"Embeddings cargados: {len(meta['legajos'])} empleados")
+            return (meta["legajos"], matriz, mitad_normas, legajos_por_fila,
+                    areas_por_fila, roles_por_fila, turnos_por_fila)
         except Exception as e:
             logger.error(f"Error al cargar embeddings: {e}")
-            return {}
+            return {}, np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32), np.empty(0, dtype=np.float32), [], [], [], []
     
     def recargar_embeddings(self):
-        """Recarga los embeddings desde el archivo"""
-        self.base_empleados = self._cargar_embeddings()
-        logger.info("Embeddings recargados")
+        """Recarga los embeddings solo si el almacén cambió desde la última lectura"""
+        with self._lock:
+            mtime = self.almacen.ultima_modificacion()
+            
+            if mtime is not None and mtime == self._mtime_embeddings:
+                logger.info("Embeddings sin cambios, se reutiliza la base en memoria")
+                return
+            
+            # Una sola asignación: las búsquedas en curso siguen con la tupla anterior
+            self._datos = self._cargar_embeddings()
+            logger.info("Embeddings recargados")
     
     def detectar_cara(self, imagen):
         """
@@ -58,11 +177,29 @@ class VerificadorFacial:
             tuple: (caras_detectadas, locations)
         """
         try:
-            # Convertir de BGR a RGB para face_recognition
-            rgb_imagen = cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
+            alto, ancho = imagen.shape[:2]
             
-            # Detectar ubicaciones de caras
-            face_locations = face_recognition.face_locations(rgb_imagen)
+            # Detectar ubicaciones de caras sobre una copia reducida
+            escala = ANCHO_DETECCION / ancho
+            chica = imagen
+            if escala < 1:
+                chica = cv2.resize(imagen, (0, 0), fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+            else:
+                escala = 1.0
+            
+            # HOG trabaja sobre grises (un tercio de los bytes); CNN necesita RGB
+            if self.modelo_deteccion == "hog":
+                deteccion = cv2.cvtColor(chica, cv2.COLOR_BGR2GRAY)
+            else:
+                deteccion = cv2.cvtColor(chica, cv2.COLOR_BGR2RGB)
+            
+            face_locations = [
+                (max(0, int(top / escala)), min(ancho, int(right / escala)),
+                 min(alto, int(bottom / escala)), max(0, int(left / escala)))
+                for top, right, bottom, left in _fr().face_locations(
+                    deteccion, model=self.modelo_deteccion
+                )
+            ]
             
             if not face_locations:
                 logger.warning("No se detectaron caras en la imagen")
@@ -70,8 +207,14 @@ class VerificadorFacial:
             
             logger.info(f"Detectadas {len(face_locations)} cara(s)")
             
-            # Generar encodings para las caras detectadas
-            face_encodings = face_recognition.face_encodings(rgb_imagen, face_locations)
+            # Generar encodings sobre la imagen completa en RGB, con las ubicaciones
+            # ya llevadas a su escala: igual que al registrar, para que los
+            # descriptores sean comparables. La conversión solo se paga si hubo cara
+            rgb_imagen = cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
+            face_encodings = _fr().face_encodings(
+                rgb_imagen, face_locations,
+                num_jitters=self.num_jitters, model=self.modelo_landmarks
+            )
             
             return face_encodings, face_locations
             
@@ -92,17 +235,19 @@ class VerificadorFacial:
         """
         try:
             legajo_str = str(legajo)
+            datos = self._datos
+            base_empleados = datos[0]
             
-            if legajo_str not in self.base_empleados:
+            if legajo_str not in base_empleados:
                 return {
                     "coincide": False,
                     "distancia": float('inf'),
                     "mensaje": f"Empleado {legajo_str} no encontrado en la base de datos"
                 }
             
-            empleado_data = self.base_empleados[legajo_str]
+            empleado_data = base_empleados[legajo_str]
             
-            if "embedding" not in empleado_data:
+            if "fila" not in empleado_data:
                 return {
                     "coincide": False,
                     "distancia": float('inf'),
@@ -110,25 +255,23 @@ class VerificadorFacial:
                 }
             
             # Obtener embedding del empleado
-            embedding_empleado = np.array(empleado_data["embedding"])
+            fila = empleado_data["fila"]
+            embedding_empleado = datos[1][fila]
             
-            # Calcular distancia
-            distancia = np.linalg.norm(encoding_imagen - embedding_empleado)
+            # Calcular distancia: el umbral se compara al cuadrado y la raíz
+            # queda solo para el valor informado
+            diferencia = np.asarray(encoding_imagen, dtype=np.float32) - embedding_empleado
+            distancia_cuadrada = float(diferencia @ diferencia)
+            coincide = distancia_cuadrada <= self.umbral_distancia * self.umbral_distancia
+            distancia = math.sqrt(distancia_cuadrada)
             
             logger.info(f"Distancia calculada para {legajo_str}: {distancia:.4f}")
             
-            coincide = distancia <= self.umbral_distancia
-            
             return {
                 "coincide": coincide,
                 "distancia": float(distancia),
                 "mensaje": f"{'Coincidencia' if coincide else 'No coincidencia'} para empleado {legajo_str}",
-                "empleado": {
-                    "legajo": legajo_str,
-                    "area": empleado_data.get("area", ""),
-                    "rol": empleado_data.get("rol", ""),
-                    "turno": empleado_data.get("turno", "")
-                }
+                "empleado": self._empleado_de_fila(datos, fila)
             }
             
         except Exception as e:
@@ -208,20 +351,24 @@ class VerificadorFacial:
             
             mejor_coincidencia = None
             menor_distancia = float('inf')
+            datos = self._datos
+            matriz_embeddings, mitad_normas, legajos_por_fila = datos[1], datos[2], datos[3]
             
-            for legajo, empleado_data in self.base_empleados.items():
-                if "embedding" not in empleado_data:
-                    continue
-                
-                embedding_empleado = np.array(empleado_data["embedding"])
-                distancia = np.linalg.norm(encoding_principal - embedding_empleado)
+            if matriz_embeddings.shape[0] > 0:
+                # ||e - q||² = 2·(½||e||² - e·q) + ||q||²: el argmin sale de un
+                # solo producto matriz-vector sobre la mitad de normas precalculada
+                consulta = np.asarray(encoding_principal, dtype=np.float32)
+                parciales = mitad_normas - matriz_embeddings @ consulta
+                fila = int(parciales.argmin())
+                legajo = legajos_por_fila[fila]
                 
-                if distancia < menor_distancia:
-                    menor_distancia = distancia
+                if legajo is not None:
+                    # La raíz se calcula solo para el ganador
+                    menor_distancia = float(np.sqrt(max(0.0, 2.0 * parciales[fila] + consulta @ consulta)))
                     mejor_coincidencia = {
                         "legajo": legajo,
-                        "distancia": distancia,
-                        "empleado": empleado_data
+                        "distancia": menor_distancia,
+                        "empleado": self._empleado_de_fila(datos, fila)
                     }
             
             if mejor_coincidencia and menor_distancia <= umbral:
@@ -229,12 +376,7 @@ class VerificadorFacial:
                     "encontrado": True,
                     "legajo": mejor_coincidencia["legajo"],
                     "distancia": float(menor_distancia),
-                    "empleado": {
-                        "legajo": mejor_coincidencia["legajo"],
-                        "area": mejor_coincidencia["empleado"].get("area", ""),
-                        "rol": mejor_coincidencia["empleado"].get("rol", ""),
-                        "turno": mejor_coincidencia["empleado"].get("turno", "")
-                    },
+                    "empleado": mejor_coincidencia["empleado"],
                     "mensaje": f"Empleado encontrado: {mejor_coincidencia['legajo']}"
                 }
             else:
@@ -253,12 +395,16 @@ class VerificadorFacial:
 
 # Instancia global del verificador
 _verificador = None
+_verificador_lock = threading.Lock()
 
 def obtener_verificador():
     """Obtiene la instancia global del verificador"""
     global _verificador
+    # Camino rápido sin lock una vez creada; el lock evita crearla dos veces
     if _verificador is None:
-        _verificador = VerificadorFacial()
+        with _verificador_lock:
+            if _verificador is None:
+                _verificador = VerificadorFacial()
     return _verificador
 
 def reconocer_empleado(imagen, legajo):
@@ -292,8 +438,3 @@ def recargar_base_empleados():
     """Recarga la base de empleados"""
     verificador = obtener_verificador()
     verificador.recargar_embeddings()
-
-# ===================================================================
-
-# reconocimiento/__init__.py
-# Archivo vacío
\ No newline at end of file
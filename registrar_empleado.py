@@ -1,44 +1,46 @@
 import cv2
 import face_recognition
-import json
-import os
+from reconocimiento.almacenEmbeddings import AlmacenEmbeddings
 
-RUTA_EMBEDDINGS = "data/embeddings.json"
+almacen = AlmacenEmbeddings("data")
 
-RUTA_EMBEDDINGS = "data/embeddings.json"
+# Una sola pasada de la red por cara; el modelo de landmarks debe ser el
+# mismo que usa VerificadorFacial para que los embeddings sean comparables
+NUM_JITTERS = 1
+MODELO_LANDMARKS = "large"
 
-def cargar_embeddings():
-    if os.path.exists(RUTA_EMBEDDINGS):
-        with open(RUTA_EMBEDDINGS, "r") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
-                else:
-                    print("⚠ El JSON no es un diccionario, iniciando vacío.")
-            except json.JSONDecodeError:
-                print("⚠ Error de formato JSON, iniciando vacío.")
-    return {}
+# El clasificador no tiene estado: se carga el XML una sola vez
+face_cascade = cv2.CascadeClassifier(
+    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+)
 
-def guardar_embeddings(base):
-    with open(RUTA_EMBEDDINGS, "w") as f:
-        json.dump(base, f)
+# Se detecta en uno de cada FRAMES_POR_DETECCION frames; en los demás se
+# reutilizan las últimas caras encontradas
+FRAMES_POR_DETECCION = 2
 
 def registrar_empleado(nombre):
     cap = cv2.VideoCapture(0)
-    face_cascade = cv2.CascadeClassifier(
-        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    )
+
+    # Resolución acotada (el driver puede entregar 1080p) y un solo frame en
+    # buffer para procesar siempre el más reciente
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
     print("Mostrate a la cámara y presioná 'q' para capturar...")
 
+    faces = ()
+    contador = 0
+
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 5)
+        if contador % FRAMES_POR_DETECCION == 0:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = face_cascade.detectMultiScale(gray, 1.1, 5)
+        contador += 1
 
         for (x, y, w, h) in faces:
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
@@ -51,12 +53,11 @@ def registrar_empleado(nombre):
                 face_img = frame[y:y + h, x:x + w]
                 face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
 
-                encodings = face_recognition.face_encodings(face_img)
+                encodings = face_recognition.face_encodings(
+                    face_img, num_jitters=NUM_JITTERS, model=MODELO_LANDMARKS
+                )
                 if encodings:
-                    embedding = encodings[0].tolist()
-                    base = cargar_embeddings()
-                    base[nombre] = embedding
-                    guardar_embeddings(base)
+                    almacen.agregar(nombre, encodings[0])
                     print(f"✅ Embedding de {nombre} guardado correctamente.")
                 else:
                     print("❌ No se pudo generar el embedding. Intentá de nuevo.")
@@ -4,15 +4,61 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+class BaseEmpleados(dict):
+    """Empleados ya indexados por legajo normalizado"""
+    pass
+
+def normalizar_base_empleados(base_empleados):
+    """
+    Convierte la base de empleados a un diccionario indexado por legajo
+    
+    Una BaseEmpleados ya normalizada se devuelve tal cual, así varios
+    validadores comparten el mismo diccionario en lugar de copiarlo.
+    
+    Args:
+        base_empleados (dict or list): Diccionario legajo -> datos, o lista de
+            empleados con clave 'legajo' (como la devuelve DatabaseManager)
+        
+    Returns:
+        BaseEmpleados: Empleados indexados por legajo
+    """
+    if isinstance(base_empleados, BaseEmpleados):
+        return base_empleados
+    if isinstance(base_empleados, dict):
+        return BaseEmpleados((str(legajo).strip(), datos) for legajo, datos in base_empleados.items())
+    return BaseEmpleados((str(empleado["legajo"]).strip(), empleado) for empleado in base_empleados)
+
+def buscar_empleado(base_empleados, legajo):
+    """
+    Busca un legajo en una base ya normalizada
+    
+    Prueba primero la clave tal como llega (el caso común, que ya viene
+    limpia) y solo si no está la normaliza con str().strip().
+    
+    Args:
+        base_empleados (dict): Empleados indexados por legajo normalizado
+        legajo: Legajo a buscar
+        
+    Returns:
+        tuple: (legajo normalizado, datos del empleado o None)
+    """
+    if legajo.__class__ is str:
+        empleado = base_empleados.get(legajo)
+        if empleado is not None:
+            return legajo, empleado
+    
+    legajo_str = str(legajo).strip()
+    return legajo_str, base_empleados.get(legajo_str)
+
 class ValidadorLegajo:
     def __init__(self, base_empleados):
         """
         Inicializa el validador de legajos
         
         Args:
-            base_empleados (dict): Base de datos de empleados
+            base_empleados (dict or list): Base de datos de empleados
         """
-        self.base_empleados = base_empleados
+        self.base_empleados = normalizar_base_empleados(base_empleados)
         logger.info(f"ValidadorLegajo inicializado con {len(base_empleados)} empleados")
     
     def validar(self, legajo):
@@ -32,10 +78,9 @@ class ValidadorLegajo:
                     "mensaje": "El legajo no puede estar vacío"
                 }
             
-            legajo_str = str(legajo).strip()
+            legajo_str, empleado = buscar_empleado(self.base_empleados, legajo)
             
-            if legajo_str in self.base_empleados:
-                empleado = self.base_empleados[legajo_str]
+            if empleado is not None:
                 logger.info(f"Legajo {legajo_str} validado correctamente")
                 
                 return {
@@ -62,6 +107,15 @@ class ValidadorLegajo:
                 "mensaje": "Error interno al validar legajo"
             }
     
+    def agregar(self, empleado):
+        """
+        Agrega un empleado recién registrado sin reconstruir el validador
+        
+        Args:
+            empleado (dict): Datos del empleado con clave 'legajo'
+        """
+        self.base_empleados[str(empleado["legajo"]).strip()] = empleado
+    
     def existe(self, legajo):
         """
         Verifica si un legajo existe (método auxiliar)
@@ -72,7 +126,7 @@ class ValidadorLegajo:
         Returns:
             bool: True si existe, False en caso contrario
         """
-        return str(legajo).strip() in self.base_empleados
+        return buscar_empleado(self.base_empleados, legajo)[1] is not None
     
     def obtener_empleado(self, legajo):
         """
@@ -84,5 +138,4 @@ class ValidadorLegajo:
         Returns:
             dict or None: Datos del empleado o None si no existe
         """
-        legajo_str = str(legajo).strip()
-        return self.base_empleados.get(legajo_str, None)
\ No newline at end of file
+        return buscar_empleado(self.base_empleados, legajo)[1]
\ No newline at end of file
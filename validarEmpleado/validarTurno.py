@@ -2,6 +2,7 @@
 
 import logging
 from datetime import datetime, time
+from validarEmpleado.validarLegajo import normalizar_base_empleados, buscar_empleado
 
 logger = logging.getLogger(__name__)
 
@@ -11,9 +12,9 @@ class ValidadorTurno:
         Inicializa el validador de turnos
         
         Args:
-            base_empleados (dict): Base de datos de empleados
+            base_empleados (dict or list): Base de datos de empleados
         """
-        self.base_empleados = base_empleados
+        self.base_empleados = normalizar_base_empleados(base_empleados)
         
         # Definir horarios de turnos (puedes ajustar según tus necesidades)
         self.horarios_turnos = {
@@ -31,6 +32,13 @@ class ValidadorTurno:
             }
         }
         
+        # Límites de cada turno en segundos desde medianoche: esta_en_horario
+        # compara números en lugar de objetos time
+        self._limites_turnos = {
+            turno: (self._segundos(horario["inicio"]), self._segundos(horario["fin"]))
+            for turno, horario in self.horarios_turnos.items()
+        }
+        
         logger.info(f"ValidadorTurno inicializado con {len(base_empleados)} empleados")
     
     def validar(self, legajo, turno_solicitado):
@@ -45,17 +53,16 @@ class ValidadorTurno:
             dict: Resultado de la validación
         """
         try:
-            legajo_str = str(legajo).strip()
+            legajo_str, empleado = buscar_empleado(self.base_empleados, legajo)
             turno_solicitado = turno_solicitado.lower().strip()
             
             # Verificar que el empleado existe
-            if legajo_str not in self.base_empleados:
+            if empleado is None:
                 return {
                     "valido": False,
                     "mensaje": f"El legajo {legajo_str} no existe"
                 }
             
-            empleado = self.base_empleados[legajo_str]
             turno_asignado = empleado.get("turno", "").lower().strip()
             
             if not turno_asignado:
@@ -99,6 +106,42 @@ class ValidadorTurno:
                 "mensaje": "Error interno al validar turno"
             }
     
+    def validar_legajo_y_turno(self, legajo, turno_solicitado):
+        """
+        Valida legajo y turno con una sola búsqueda del empleado
+        
+        Args:
+            legajo (str): Legajo del empleado
+            turno_solicitado (str): Turno solicitado
+            
+        Returns:
+            str or None: None si ambos son válidos, "legajo" si el legajo no
+            existe o "turno" si no coincide con el turno asignado
+        """
+        empleado = buscar_empleado(self.base_empleados, legajo)[1]
+        if empleado is None:
+            return "legajo"
+        
+        turno_asignado = (empleado.get("turno") or "").lower().strip()
+        if not turno_asignado or turno_asignado != str(turno_solicitado).lower().strip():
+            return "turno"
+        
+        return None
+    
+    def agregar(self, empleado):
+        """
+        Agrega un empleado recién registrado sin reconstruir el validador
+        
+        Args:
+            empleado (dict): Datos del empleado con clave 'legajo'
+        """
+        self.base_empleados[str(empleado["legajo"]).strip()] = empleado
+    
+    @staticmethod
+    def _segundos(hora):
+        """Segundos desde medianoche de un objeto time (con fracción)"""
+        return hora.hour * 3600 + hora.minute * 60 + hora.second + hora.microsecond / 1e6
+    
     def esta_en_horario(self, turno, hora_actual):
         """
         Verifica si la hora actual está dentro del horario del turno
@@ -110,21 +153,18 @@ class ValidadorTurno:
         Returns:
             bool: True si está en horario, False en caso contrario
         """
-        if turno not in self.horarios_turnos:
+        limites = self._limites_turnos.get(turno)
+        if limites is None:
             logger.warning(f"Turno {turno} no definido en horarios")
             return False
         
-        horario = self.horarios_turnos[turno]
-        inicio = horario["inicio"]
-        fin = horario["fin"]
+        inicio, fin = limites
+        segundos = self._segundos(hora_actual)
         
-        # Caso especial para turno noche (cruza medianoche)
-        if turno == "noche":
-            # El turno noche va de 22:00 a 06:00 del día siguiente
-            return hora_actual >= inicio or hora_actual <= fin
-        else:
-            # Turnos normales
-            return inicio <= hora_actual <= fin
+        # Un turno que cruza medianoche (noche: 22:00 a 06:00) termina antes de empezar
+        if inicio > fin:
+            return segundos >= inicio or segundos <= fin
+        return inicio <= segundos <= fin
     
     def obtener_horario_turno(self, turno):
         """